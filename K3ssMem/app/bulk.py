@@ -0,0 +1,217 @@
+"""
+Bulk import and export of the knowledge graph as JSONL.
+
+The format is the one GET /graph/stream produces: one record per line with a
+"type" of "entity" or "relation" ("end" records are ignored). Entity records
+may carry a precomputed "embedding" and "embeddingCount", which import keeps
+instead of calling the embedding service. Relations must come after the
+entities they connect, as export writes them.
+
+Used by the import_graph and export_graph tools and by the bulk.py CLI.
+"""
+import asyncio
+import itertools
+import os
+import sys
+import time
+from typing import AsyncIterable, Iterable
+
+from app.config import settings
+from app.neo4j_client import Neo4jClient
+from app.serialization import dumps, loads
+
+# Lines read, or records written, per call into a worker thread
+_IO_BLOCK = 1000
+# Entity chunks in flight: the next chunk is embedded while the previous one is written
+_MAX_PENDING_CHUNKS = 2
+
+
+def resolve_path(path: str) -> str:
+    """Resolves a path given to the MCP tools inside BULK_DIRECTORY, rejecting paths that escape it."""
+    root = os.path.realpath(settings.BULK_DIRECTORY)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Path '{path}' is outside the bulk directory.")
+    return resolved
+
+
+async def read_records(path: str):
+    """Yields the records of a JSONL file, or of stdin for '-', reading in a worker thread."""
+    f = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        line_number = 0
+        while True:
+            lines = await asyncio.to_thread(lambda: list(itertools.islice(f, _IO_BLOCK)))
+            if not lines:
+                break
+            for line in lines:
+                line_number += 1
+                if not line.strip():
+                    continue
+                try:
+                    yield loads(line)
+                except ValueError as e:
+                    raise ValueError(f"Line {line_number}: invalid JSON ({e})")
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+
+
+async def write_records(records: AsyncIterable[dict], path: str) -> int:
+    """Writes records as JSONL to path, or to stdout for '-'. Returns the number written."""
+    # sys.__stdout__, so the CLI can point sys.stdout at stderr for log output
+    f = sys.__stdout__.buffer if path == "-" else open(path, "wb")
+    written = 0
+    try:
+        block = []
+        async for record in records:
+            block.append(dumps(record) + b"\n")
+            written += 1
+            if len(block) >= _IO_BLOCK:
+                await asyncio.to_thread(f.writelines, block)
+                block = []
+        if block:
+            await asyncio.to_thread(f.writelines, block)
+        f.flush()
+    finally:
+        if f is not sys.__stdout__.buffer:
+            f.close()
+    return written
+
+
+async def _iterate(records: AsyncIterable[dict] | Iterable[dict]):
+    if hasattr(records, "__aiter__"):
+        async for record in records:
+            yield record
+    else:
+        for record in records:
+            yield record
+
+
+class _Importer:
+    """
+    Groups records into IMPORT_CHUNK_SIZE chunks and writes them while the
+    next chunk is being read and embedded. Relation chunks wait for every
+    earlier write, so the entities they connect exist.
+    """
+
+    def __init__(self, neo4j_client: Neo4jClient, reembed: bool, on_progress=None):
+        self.client = neo4j_client
+        self.reembed = reembed
+        self.on_progress = on_progress
+        self.chunk_size = max(1, settings.IMPORT_CHUNK_SIZE)
+        self.entities: list[dict] = []
+        self.relations: list[dict] = []
+        self.pending: list[asyncio.Task] = []
+        self.counts = {"entities": 0, "entitiesCreated": 0, "embedded": 0, "pending": 0, "relations": 0, "relationsCreated": 0}
+
+    async def add(self, record: dict) -> None:
+        record_type = record.get("type")
+        if record_type == "entity":
+            if not record.get("name") or not record.get("entityType"):
+                raise ValueError(f"Entity records need a name and an entityType: {record}")
+            if self.relations:
+                await self.flush_relations()
+            self.entities.append(record)
+            if len(self.entities) >= self.chunk_size:
+                await self.flush_entities()
+        elif record_type == "relation":
+            if not record.get("from") or not record.get("to") or not record.get("relationType"):
+                raise ValueError(f"Relation records need from, to and relationType: {record}")
+            if self.entities:
+                await self.flush_entities()
+            self.relations.append(record)
+            if len(self.relations) >= self.chunk_size:
+                await self.flush_relations()
+        elif record_type != "end":
+            raise ValueError(f"Unknown record type '{record_type}'. Expected 'entity' or 'relation'.")
+
+    async def flush_entities(self) -> None:
+        entities, self.entities = self.entities, []
+        await self._wait(_MAX_PENDING_CHUNKS - 1)
+        self.pending.append(asyncio.create_task(self._write_entities(entities)))
+
+    async def flush_relations(self) -> None:
+        relations, self.relations = self.relations, []
+        await self._wait(0)
+        self.pending.append(asyncio.create_task(self._write_relations(relations)))
+
+    async def finish(self) -> None:
+        if self.entities:
+            await self.flush_entities()
+        if self.relations:
+            await self.flush_relations()
+        await self._wait(0)
+
+    async def cancel(self) -> None:
+        for task in self.pending:
+            task.cancel()
+        await asyncio.gather(*self.pending, return_exceptions=True)
+
+    async def _wait(self, max_pending: int) -> None:
+        """Waits for the oldest writes until at most max_pending remain, raising their errors."""
+        while len(self.pending) > max_pending:
+            await self.pending.pop(0)
+
+    async def _write_entities(self, entities: list[dict]) -> None:
+        result = await self.client.import_entities(entities, reembed=self.reembed)
+        self.counts["entities"] += result["entities"]
+        self.counts["entitiesCreated"] += result["created"]
+        self.counts["embedded"] += result["embedded"]
+        self.counts["pending"] += result["pending"]
+        self._report()
+
+    async def _write_relations(self, relations: list[dict]) -> None:
+        result = await self.client.import_relations(relations)
+        self.counts["relations"] += result["relations"]
+        self.counts["relationsCreated"] += result["created"]
+        self._report()
+
+    def _report(self) -> None:
+        if self.on_progress:
+            self.on_progress(**self.counts)
+
+
+async def import_graph(
+    neo4j_client: Neo4jClient,
+    records: AsyncIterable[dict] | Iterable[dict],
+    reembed: bool = False,
+    on_progress=None,
+) -> dict:
+    """
+    Imports entity and relation records, merging on entity name and on
+    relation endpoints and type. on_progress, if given, is called with the
+    running counts after each chunk is written.
+    """
+    start_time = time.time()
+    importer = _Importer(neo4j_client, reembed, on_progress)
+    try:
+        async for record in _iterate(records):
+            await importer.add(record)
+        await importer.finish()
+    except BaseException:
+        await importer.cancel()
+        raise
+
+    return {**importer.counts, "timeTaken": (time.time() - start_time) * 1000}
+
+
+async def export_records(neo4j_client: Neo4jClient, include_embeddings: bool = False):
+    """Yields every entity, then every relation, in the import format."""
+    async for record in neo4j_client.stream_graph(include_embeddings=include_embeddings):
+        if record["type"] != "end":
+            yield record
+
+
+async def export_graph(neo4j_client: Neo4jClient, path: str, include_embeddings: bool = False) -> dict:
+    """Exports the whole graph to a JSONL file, or to stdout for '-'."""
+    start_time = time.time()
+    counts = {"entities": 0, "relations": 0}
+
+    async def counted():
+        async for record in export_records(neo4j_client, include_embeddings):
+            counts["entities" if record["type"] == "entity" else "relations"] += 1
+            yield record
+
+    await write_records(counted(), path)
+    return {**counts, "path": path, "timeTaken": (time.time() - start_time) * 1000}
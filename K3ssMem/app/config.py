@@ -14,9 +14,130 @@ class Settings(BaseSettings):
     NEO4J_URI: str = "bolt://localhost:7687"
     NEO4J_USER: str = "neo4j"
     NEO4J_PASSWORD: str = "memento_password"
+    # Database to use; unset means the user's home database (costs a lookup per session)
+    NEO4J_DATABASE: str | None = None
+
+    # Driver connection pool (connections per server / seconds)
+    NEO4J_MAX_CONNECTION_POOL_SIZE: int = 100
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT: float = 60.0
+    NEO4J_MAX_CONNECTION_LIFETIME: float = 3600.0
+    # Total time managed transactions are retried on transient errors (seconds)
+    NEO4J_MAX_TRANSACTION_RETRY_TIME: float = 30.0
+    # Send read transactions to followers/read replicas (needs a neo4j:// URI on a cluster)
+    NEO4J_ROUTE_READS: bool = True
+    # Share bookmarks between sessions so reads see this server's earlier writes
+    NEO4J_CAUSAL_CONSISTENCY: bool = True
+
+    # Create constraints and indexes on startup, waiting up to SCHEMA_AWAIT_TIMEOUT seconds
+    SCHEMA_BOOTSTRAP: bool = True
+    SCHEMA_AWAIT_TIMEOUT: int = 60
+
+    # Hybrid search: candidates fetched from each index, and reciprocal rank fusion parameters
+    HYBRID_CANDIDATES: int = 50
+    HYBRID_VECTOR_WEIGHT: float = 1.0
+    HYBRID_TEXT_WEIGHT: float = 1.0
+    HYBRID_RRF_K: int = 60
+
+    # Result cache for semantic_search, open_nodes and paginated read_graph
+    # (seconds / entries / total serialized size of the cached results)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_TTL: float = 300.0
+    RESULT_CACHE_MAX_ENTRIES: int = 1000
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+
+    # Tool calls running at once per class, and seconds before a call is abandoned
+    TOOL_READ_CONCURRENCY: int = 32
+    TOOL_WRITE_CONCURRENCY: int = 4
+    TOOL_READ_TIMEOUT: float = 60.0
+    TOOL_WRITE_TIMEOUT: float = 300.0
+
+    # Compress /mcp responses of at least RESPONSE_COMPRESSION_MIN_BYTES when the
+    # client sends Accept-Encoding (zstd needs the zstandard package, else gzip)
+    RESPONSE_COMPRESSION: bool = True
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 5
+    RESPONSE_ZSTD_LEVEL: int = 3
+
+    # Expose Prometheus metrics at GET /metrics (requires prometheus_client)
+    METRICS_ENABLED: bool = True
+
+    # OpenTelemetry tracing (requires opentelemetry-sdk). TRACING_EXPORTER is "otlp",
+    # configured through the standard OTEL_EXPORTER_OTLP_* variables, or "file"
+    TRACING_ENABLED: bool = False
+    TRACING_EXPORTER: str = "otlp"
+    TRACING_FILE_PATH: str = "traces.jsonl"
+    TRACING_SERVICE_NAME: str = "borg-collective-memory"
+
+    # Default of create_entities' upsert argument: merge into existing entities
+    # with the same name instead of creating duplicates
+    CREATE_ENTITIES_UPSERT: bool = False
+
+    # Upper bound for semantic_search expand_hops
+    EXPAND_MAX_HOPS: int = 3
+
+    # Background deletion: entities handled per progress step, and rows per
+    # inner transaction of CALL { ... } IN TRANSACTIONS
+    DELETE_ENTITY_CHUNK_SIZE: int = 100
+    DELETE_BATCH_SIZE: int = 1000
+
+    # Bulk import/export: rows per inner transaction of CALL { ... } IN TRANSACTIONS,
+    # records sent per import statement, and the directory the import_graph and
+    # export_graph tools resolve file paths against
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_CHUNK_SIZE: int = 10000
+    BULK_DIRECTORY: str = "bulk"
+
+    # Embedding backend: "ollama" calls the HTTP API below, "local" runs a
+    # sentence-transformers model in process (requires sentence-transformers)
+    EMBEDDING_BACKEND: str = "ollama"
+    # Local backend: model name or path, runtime ("torch", "onnx" or "openvino"),
+    # device, and threads encoding batches
+    EMBEDDING_LOCAL_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_LOCAL_RUNTIME: str = "torch"
+    EMBEDDING_LOCAL_DEVICE: str = "cpu"
+    EMBEDDING_LOCAL_THREADS: int = 2
 
     # URL for the local embedding model API
     LOCAL_EMBEDDING_URL: str = "http://localhost:11434/api/embeddings" # Default for Ollama
+    # Batch endpoint that accepts an "input" array. Derived from LOCAL_EMBEDDING_URL when unset.
+    LOCAL_EMBEDDING_BATCH_URL: str | None = None
+    EMBEDDING_MODEL: str = "nomic-embed-text"
+    # Vector size of the embedding model. Discovered from the backend when unset;
+    # when set, the model's actual size is checked against it
+    EMBEDDING_DIMENSIONS: int | None = None
+
+    # Bulk embedding pipeline: texts per /api/embed call and concurrent calls in flight
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_CONCURRENCY: int = 4
+    # Embed each observation separately and store their mean on the entity, so
+    # adding an observation only embeds the new text instead of the whole entity
+    OBSERVATION_EMBEDDINGS: bool = False
+
+    # Write-behind embeddings: write tools commit entities with embeddingStatus
+    # 'pending' and return; background workers embed them in batches of
+    # EMBEDDING_WORKER_BATCH_SIZE, polling every EMBEDDING_WORKER_POLL_INTERVAL
+    # seconds and backing off EMBEDDING_WORKER_RETRY_DELAY seconds after a failure.
+    # An entity that fails EMBEDDING_WORKER_MAX_ATTEMPTS times is marked 'failed'
+    EMBEDDING_WRITE_BEHIND: bool = False
+    EMBEDDING_WORKERS: int = 2
+    EMBEDDING_WORKER_BATCH_SIZE: int = 64
+    EMBEDDING_WORKER_POLL_INTERVAL: float = 5.0
+    EMBEDDING_WORKER_RETRY_DELAY: float = 10.0
+    EMBEDDING_WORKER_MAX_ATTEMPTS: int = 5
+
+    # Shared HTTP client for the embedding service (seconds / connection counts)
+    EMBEDDING_TIMEOUT: float = 30.0
+    EMBEDDING_CONNECT_TIMEOUT: float = 5.0
+    EMBEDDING_MAX_CONNECTIONS: int = 20
+    EMBEDDING_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    EMBEDDING_KEEPALIVE_EXPIRY: float = 30.0
+    # Negotiated over TLS only, and only when the optional 'h2' package is installed
+    EMBEDDING_HTTP2: bool = True
+
+    # Embedding cache: in-process LRU bounded by bytes, plus an optional SQLite file
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    EMBEDDING_CACHE_PATH: str | None = None
 
 # Create a single, reusable instance of the settings
 settings = Settings()
@@ -0,0 +1,236 @@
+"""
+Embedding backends.
+
+A backend turns a batch of texts into vectors. "ollama" calls an Ollama
+server over HTTP; "local" runs a sentence-transformers model (PyTorch or
+ONNX Runtime) in this process on a small thread pool, which removes the
+network hop on single-box deployments. Backends raise EmbeddingError when
+texts cannot be embedded; there are no placeholder vectors.
+
+The local backend requires the optional sentence-transformers package
+(sentence-transformers[onnx] for EMBEDDING_LOCAL_RUNTIME=onnx).
+"""
+import asyncio
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from app.config import settings
+
+BACKENDS = ("ollama", "local")
+
+
+class EmbeddingError(Exception):
+    """Raised when texts cannot be embedded, or the vectors do not fit the configured dimensions."""
+
+
+class EmbeddingBackend:
+    """Turns texts into embedding vectors."""
+
+    # Backend name, reported in traces
+    name = ""
+
+    @property
+    def model(self) -> str:
+        """Name of the model, part of the embedding cache key."""
+        raise NotImplementedError
+
+    async def start(self) -> None:
+        """Acquires resources (connections, model weights). Called on application startup."""
+
+    async def close(self) -> None:
+        """Releases resources. Called on application shutdown."""
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """Returns one vector per text, in order. Raises EmbeddingError on failure."""
+        raise NotImplementedError
+
+    async def dimensions(self) -> int:
+        """Returns the vector size of the model."""
+        return len((await self.embed(["dimension probe"]))[0])
+
+
+class OllamaBackend(EmbeddingBackend):
+    """Embeds through Ollama's /api/embed batch endpoint, with /api/embeddings as a per-text fallback."""
+
+    name = "ollama"
+
+    def __init__(self):
+        # Long-lived client shared by every embedding call, created lazily
+        self._http_client: httpx.AsyncClient | None = None
+
+    @property
+    def model(self) -> str:
+        return settings.EMBEDDING_MODEL
+
+    @staticmethod
+    def _build_http_client() -> httpx.AsyncClient:
+        """Builds a pooled keep-alive client configured from settings."""
+        http2 = settings.EMBEDDING_HTTP2 and importlib.util.find_spec("h2") is not None
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.EMBEDDING_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.EMBEDDING_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.EMBEDDING_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(settings.EMBEDDING_TIMEOUT, connect=settings.EMBEDDING_CONNECT_TIMEOUT),
+        )
+
+    def _client(self) -> httpx.AsyncClient:
+        """Returns the shared client, creating it on first use."""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = self._build_http_client()
+        return self._http_client
+
+    async def start(self) -> None:
+        self._client()
+
+    async def close(self) -> None:
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    @staticmethod
+    def _batch_url() -> str:
+        """Returns the URL of Ollama's batch embedding endpoint (/api/embed)."""
+        if settings.LOCAL_EMBEDDING_BATCH_URL:
+            return settings.LOCAL_EMBEDDING_BATCH_URL
+        url = settings.LOCAL_EMBEDDING_URL.rstrip("/")
+        if url.endswith("/api/embeddings"):
+            return url[: -len("/api/embeddings")] + "/api/embed"
+        return url
+
+    async def _request_embedding(self, text: str) -> list[float]:
+        """Requests a single embedding from the legacy /api/embeddings endpoint."""
+        payload = {
+            "model": settings.EMBEDDING_MODEL,
+            "prompt": text
+        }
+        response = await self._client().post(settings.LOCAL_EMBEDDING_URL, json=payload)
+        response.raise_for_status()
+        # The response structure may vary depending on the local server.
+        # Ollama returns a dictionary with an "embedding" key.
+        data = response.json()
+        if "embedding" in data:
+            return data["embedding"]
+        elif "embeddings" in data:
+            return data["embeddings"]
+        raise KeyError(f"'embedding' or 'embeddings' key not found in response from {settings.LOCAL_EMBEDDING_URL}")
+
+    async def _request_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """Requests embeddings for a batch of texts in one call to /api/embed."""
+        payload = {
+            "model": settings.EMBEDDING_MODEL,
+            "input": texts
+        }
+        response = await self._client().post(self._batch_url(), json=payload)
+        response.raise_for_status()
+        embeddings = response.json().get("embeddings")
+        if not isinstance(embeddings, list) or len(embeddings) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings from {self._batch_url()}, got {len(embeddings or [])}")
+        return embeddings
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embeds one batch, falling back to one request per text if the batch
+        call fails (e.g. an Ollama version without /api/embed).
+        """
+        try:
+            return await self._request_embeddings(texts)
+        except httpx.RequestError as e:
+            # Ollama is unreachable or timed out; single requests would fail the same way
+            raise EmbeddingError(f"Ollama could not embed {len(texts)} texts with {settings.EMBEDDING_MODEL}: {e}") from e
+        except Exception as e:
+            print(f"Batch embedding failed, falling back to single requests: {e}")
+
+        try:
+            return list(await asyncio.gather(*(self._request_embedding(text) for text in texts)))
+        except Exception as e:
+            raise EmbeddingError(f"Ollama could not embed {len(texts)} texts with {settings.EMBEDDING_MODEL}: {e}") from e
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """
+    Runs a sentence-transformers model in process. Batches are encoded on a
+    pool of EMBEDDING_LOCAL_THREADS threads so the event loop stays free;
+    the heavy lifting releases the GIL inside PyTorch or ONNX Runtime.
+    """
+
+    name = "local"
+
+    def __init__(self):
+        self._model = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._loading: asyncio.Lock | None = None
+
+    @property
+    def model(self) -> str:
+        return settings.EMBEDDING_LOCAL_MODEL
+
+    def _load(self):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise EmbeddingError(
+                "EMBEDDING_BACKEND=local requires the sentence-transformers package "
+                "(pip install sentence-transformers, or sentence-transformers[onnx] for the ONNX runtime)"
+            ) from e
+        options = {"device": settings.EMBEDDING_LOCAL_DEVICE}
+        if settings.EMBEDDING_LOCAL_RUNTIME != "torch":
+            options["backend"] = settings.EMBEDDING_LOCAL_RUNTIME
+        try:
+            return SentenceTransformer(settings.EMBEDDING_LOCAL_MODEL, **options)
+        except Exception as e:
+            raise EmbeddingError(f"Could not load embedding model {settings.EMBEDDING_LOCAL_MODEL}: {e}") from e
+
+    async def start(self) -> None:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.EMBEDDING_LOCAL_THREADS), thread_name_prefix="embedding"
+            )
+            self._loading = asyncio.Lock()
+        async with self._loading:
+            if self._model is None:
+                # Loading reads the weights from disk (or downloads them once); keep it off the event loop
+                self._model = await asyncio.get_running_loop().run_in_executor(self._executor, self._load)
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._model = None
+
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        vectors = self._model.encode(
+            texts,
+            batch_size=max(1, settings.EMBEDDING_BATCH_SIZE),
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        if self._model is None:
+            await self.start()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._encode, texts)
+        except Exception as e:
+            raise EmbeddingError(f"{settings.EMBEDDING_LOCAL_MODEL} could not embed {len(texts)} texts: {e}") from e
+
+    async def dimensions(self) -> int:
+        if self._model is None:
+            await self.start()
+        dimensions = self._model.get_sentence_embedding_dimension()
+        return dimensions if dimensions else await super().dimensions()
+
+
+def create_backend(name: str) -> EmbeddingBackend:
+    """Returns the backend selected by EMBEDDING_BACKEND."""
+    if name == "ollama":
+        return OllamaBackend()
+    if name == "local":
+        return SentenceTransformerBackend()
+    raise EmbeddingError(f"Unknown EMBEDDING_BACKEND '{name}'. Allowed: {', '.join(BACKENDS)}")
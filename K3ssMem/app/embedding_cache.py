@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import sqlite3
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+from app.config import settings
+
+
+class EmbeddingCache:
+    """
+    A content-addressed cache of embedding vectors keyed by (model, text hash).
+
+    The first tier is an in-process LRU bounded by the total size of the stored
+    vectors. The optional second tier is a SQLite file that survives restarts;
+    vectors found there are promoted back into memory. Vectors are stored as
+    packed float32, the precision the Neo4j vector index uses anyway.
+    """
+
+    def __init__(self, max_bytes: int, path: str | None = None):
+        self.max_bytes = max_bytes
+        self.path = path
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        """Returns the cache key for a text embedded with the given model."""
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _pack(vector: list[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _unpack(blob: bytes) -> list[float]:
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def _remember(self, key: str, blob: bytes) -> None:
+        """Stores a packed vector in the memory tier, evicting least recently used entries."""
+        if len(blob) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = blob
+        self._bytes += len(blob)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        return self._db
+
+    def _disk_get(self, keys: list[str]) -> dict[str, bytes]:
+        found = {}
+        with self._db_lock:
+            db = self._connect()
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = db.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk)
+                found.update(rows.fetchall())
+        return found
+
+    def _disk_put(self, items: dict[str, bytes]) -> None:
+        with self._db_lock:
+            db = self._connect()
+            db.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", items.items())
+            db.commit()
+
+    async def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        """Looks up vectors for the given keys. Missing keys are absent from the result."""
+        found: dict[str, list[float]] = {}
+        missing = []
+        for key in keys:
+            blob = self._entries.get(key)
+            if blob is None:
+                missing.append(key)
+                continue
+            self._entries.move_to_end(key)
+            found[key] = self._unpack(blob)
+            self.hits += 1
+
+        if missing and self.path:
+            try:
+                on_disk = await asyncio.to_thread(self._disk_get, missing)
+            except sqlite3.Error as e:
+                print(f"Embedding cache read failed: {e}", file=sys.stderr)
+                on_disk = {}
+            for key, blob in on_disk.items():
+                self._remember(key, blob)
+                found[key] = self._unpack(blob)
+                self.disk_hits += 1
+
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def put_many(self, vectors: dict[str, list[float]]) -> None:
+        """Stores vectors in the memory tier and, when configured, on disk."""
+        if not vectors:
+            return
+        packed = {key: self._pack(vector) for key, vector in vectors.items()}
+        for key, blob in packed.items():
+            self._remember(key, blob)
+        if self.path:
+            try:
+                await asyncio.to_thread(self._disk_put, packed)
+            except sqlite3.Error as e:
+                print(f"Embedding cache write failed: {e}", file=sys.stderr)
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and memory usage."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "diskHits": self.disk_hits,
+            "misses": self.misses,
+            "hitRate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "maxBytes": self.max_bytes,
+            "persistent": bool(self.path),
+        }
+
+    def clear(self) -> None:
+        """Drops the memory tier. The disk tier is left untouched."""
+        self._entries.clear()
+        self._bytes = 0
+
+    def close(self) -> None:
+        """Closes the disk tier, if open."""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# Create a single, reusable cache instance
+embedding_cache = EmbeddingCache(
+    max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+    path=settings.EMBEDDING_CACHE_PATH,
+)
@@ -1,35 +1,191 @@
-import httpx
+"""
+Embedding entry points used by the rest of the app.
+
+Texts go through the embedding cache, then to the backend selected by
+EMBEDDING_BACKEND in batches of EMBEDDING_BATCH_SIZE. Every vector is checked
+against the model's dimensions, and failures raise EmbeddingError instead of
+storing vectors that would corrupt the index.
+"""
+import asyncio
+import sys
+
 from app.config import settings
+from app.embedding_backends import EmbeddingBackend, EmbeddingError, create_backend
+from app.embedding_cache import EmbeddingCache, embedding_cache
+from app.metrics import count_embedded_texts, time_stage
+from app.tracing import set_attributes, span
+
+# Owned by the application lifecycle (init_embedding_client/close_embedding_client), created lazily otherwise
+_backend: EmbeddingBackend | None = None
+# Vector size reported by the model, once known
+_dimensions: int | None = None
+
+
+def _get_backend() -> EmbeddingBackend:
+    """Returns the configured backend, creating it on first use."""
+    global _backend
+    if _backend is None:
+        _backend = create_backend(settings.EMBEDDING_BACKEND)
+    return _backend
+
+
+def get_embedding_model() -> str:
+    """Returns the name of the model the configured backend embeds with."""
+    return _get_backend().model
+
+
+async def init_embedding_client() -> None:
+    """Starts the embedding backend. Called on application startup."""
+    backend = _get_backend()
+    await backend.start()
+    print(f"Embedding backend: {backend.name} ({backend.model}).", file=sys.stderr)
+
+
+async def close_embedding_client() -> None:
+    """Stops the embedding backend. Called on application shutdown."""
+    global _backend, _dimensions
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
+    _dimensions = None
+    embedding_cache.close()
+
+
+async def get_embedding_dimensions() -> int:
+    """
+    Returns the vector size of the configured embedding model, asking the
+    backend once. Raises EmbeddingError if it differs from
+    EMBEDDING_DIMENSIONS, or if the model cannot be reached and
+    EMBEDDING_DIMENSIONS is unset.
+    """
+    global _dimensions
+    if _dimensions is None:
+        try:
+            discovered = await _get_backend().dimensions()
+        except Exception as e:
+            if settings.EMBEDDING_DIMENSIONS:
+                print(f"Warning: could not check embedding dimensions, using EMBEDDING_DIMENSIONS: {e}", file=sys.stderr)
+                return settings.EMBEDDING_DIMENSIONS
+            raise EmbeddingError(f"Could not determine embedding dimensions: {e}") from e
+        _dimensions = discovered
+    if settings.EMBEDDING_DIMENSIONS and settings.EMBEDDING_DIMENSIONS != _dimensions:
+        raise EmbeddingError(
+            f"EMBEDDING_DIMENSIONS is {settings.EMBEDDING_DIMENSIONS} but {_get_backend().model} produces {_dimensions}-dimensional vectors"
+        )
+    return _dimensions
+
+
+def _check_dimensions(vectors: list[list[float]]) -> None:
+    """Raises EmbeddingError unless every vector has the expected size."""
+    global _dimensions
+    expected = settings.EMBEDDING_DIMENSIONS or _dimensions
+    for vector in vectors:
+        if not vector:
+            raise EmbeddingError(f"{_get_backend().model} returned an empty embedding")
+        if expected is None:
+            # The first vector seen tells the model's size
+            expected = _dimensions = len(vector)
+        if len(vector) != expected:
+            raise EmbeddingError(
+                f"{_get_backend().model} returned a {len(vector)}-dimensional embedding, expected {expected}"
+            )
+
+
+async def _embed_batch(texts: list[str]) -> list[list[float]]:
+    """Embeds one batch through the backend and validates the result."""
+    backend = _get_backend()
+    count_embedded_texts(len(texts))
+    with span("embedding.request", {
+        "embedding.backend": backend.name, "embedding.model": backend.model, "embedding.batch_size": len(texts)
+    }), time_stage("embedding"):
+        vectors = await backend.embed(texts)
+    if len(vectors) != len(texts):
+        raise EmbeddingError(f"Expected {len(texts)} embeddings from {backend.model}, got {len(vectors)}")
+    _check_dimensions(vectors)
+    return vectors
+
+
+async def check_embedding_backend() -> None:
+    """Embeds a known-good text, bypassing the cache. Raises if the backend cannot embed it."""
+    await _embed_batch(["embedding backend check"])
+
 
 async def get_embedding(text: str) -> list[float]:
     """
-    Gets an embedding vector for the given text from a local model API.
-    """
-    # In a real app, the model name could also be a setting
-    payload = {
-        "model": "nomic-embed-text", # Our chosen local embedding model
-        "prompt": text
-    }
-    
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(settings.LOCAL_EMBEDDING_URL, json=payload, timeout=30.0)
-            response.raise_for_status()
-            # The response structure may vary depending on the local server.
-            # Ollama returns a dictionary with an "embedding" key.
-            data = response.json()
-            if "embedding" in data:
-                return data["embedding"]
-            elif "embeddings" in data:
-                return data["embeddings"]
-            else:
-                print(f"Warning: 'embedding' or 'embeddings' key not found in response from {settings.LOCAL_EMBEDDING_URL}")
-                return [0.0] * 384 # Fallback
-
-    except httpx.RequestError as e:
-        print(f"Error requesting embedding: {e}")
-        # Return a zero vector or handle the error as appropriate
-        return [0.0] * 384 # Default dimension for some models
-    except Exception as e:
-        print(f"An unexpected error occurred in get_embedding: {e}")
-        return [0.0] * 384
+    Gets an embedding vector for the given text. Raises EmbeddingError on failure.
+    """
+    with span("embedding.get", {"embedding.texts": 1}) as current:
+        return await _get_embedding(text, current)
+
+
+async def _get_embedding(text: str, current) -> list[float]:
+    key = EmbeddingCache.key(_get_backend().model, text)
+    if settings.EMBEDDING_CACHE_ENABLED:
+        cached = await embedding_cache.get_many([key])
+        if key in cached:
+            set_attributes(current, {"embedding.cache_hits": 1})
+            return cached[key]
+
+    embedding = (await _embed_batch([text]))[0]
+
+    if settings.EMBEDDING_CACHE_ENABLED:
+        await embedding_cache.put_many({key: embedding})
+    return embedding
+
+
+async def get_embeddings(texts: list[str]) -> list[list[float]]:
+    """
+    Gets embedding vectors for many texts, preserving their order.
+
+    Cached texts are served from the embedding cache and duplicate texts are
+    embedded once. The rest are split into batches of EMBEDDING_BATCH_SIZE and
+    sent to the backend with at most EMBEDDING_CONCURRENCY batches in flight.
+    Raises EmbeddingError if any batch fails; batches that succeeded are cached.
+    """
+    if not texts:
+        return []
+
+    with span("embedding.get", {"embedding.texts": len(texts)}) as current:
+        return await _get_embeddings(texts, current)
+
+
+async def _get_embeddings(texts: list[str], current) -> list[list[float]]:
+    model = _get_backend().model
+    keys = [EmbeddingCache.key(model, text) for text in texts]
+    vectors = await embedding_cache.get_many(keys) if settings.EMBEDDING_CACHE_ENABLED else {}
+
+    # Unique texts that still need embedding, keyed by cache key
+    pending = {key: text for key, text in zip(keys, texts) if key not in vectors}
+    set_attributes(current, {"embedding.cache_hits": len(vectors), "embedding.pending": len(pending)})
+    if pending:
+        pending_keys = list(pending)
+        batch_size = max(1, settings.EMBEDDING_BATCH_SIZE)
+        semaphore = asyncio.Semaphore(max(1, settings.EMBEDDING_CONCURRENCY))
+
+        async def embed_batch(batch_keys: list[str]) -> None:
+            async with semaphore:
+                embedded = dict(zip(batch_keys, await _embed_batch([pending[key] for key in batch_keys])))
+            if settings.EMBEDDING_CACHE_ENABLED:
+                await embedding_cache.put_many(embedded)
+            vectors.update(embedded)
+
+        await asyncio.gather(*(
+            embed_batch(pending_keys[i:i + batch_size]) for i in range(0, len(pending_keys), batch_size)
+        ))
+
+    return [vectors[key] for key in keys]
+
+
+def mean_embedding(vectors: list[list[float]], previous: list[float] | None = None, previous_count: int = 0) -> list[float]:
+    """
+    Returns the element-wise mean of the given vectors. When a previous mean
+    over previous_count vectors is supplied, it is extended incrementally.
+    """
+    count = previous_count + len(vectors)
+    if previous is not None and previous_count:
+        totals = [value * previous_count for value in previous]
+    else:
+        totals = [0.0] * len(vectors[0])
+    for vector in vectors:
+        totals = [total + value for total, value in zip(totals, vector)]
+    return [total / count for total in totals]
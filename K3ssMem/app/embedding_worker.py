@@ -0,0 +1,155 @@
+"""
+Write-behind embedding worker.
+
+With EMBEDDING_WRITE_BEHIND, write tools commit entities with embeddingStatus
+'pending' instead of waiting for the embedding service. The pending nodes are
+the queue, so it survives restarts and needs no broker: EMBEDDING_WORKERS
+tasks in the server process claim batches of them, embed their observations
+and fill in the embedding, clearing the status. Entities whose observations
+change while they are embedded stay pending and are picked up again.
+
+When a batch fails its entities are retried one by one, so one text the
+backend rejects cannot block the rest. Each failure is counted on the
+entity, which is marked 'failed' after EMBEDDING_WORKER_MAX_ATTEMPTS. If
+every entity of a batch fails, a known-good text is embedded to tell a
+backend that is down from texts it rejects: when it fails too nothing is
+counted and the worker backs off.
+"""
+import asyncio
+import sys
+
+from app.config import settings
+from app.embedding_client import check_embedding_backend
+from app.neo4j_client import Neo4jClient
+from app.result_cache import result_cache
+
+
+class EmbeddingWorker:
+    """A pool of background tasks draining pending embeddings."""
+
+    def __init__(self):
+        self._neo4j_client: Neo4jClient | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._wake = asyncio.Event()
+        # Claims are serialized so two workers never take the same entities
+        self._claim_lock = asyncio.Lock()
+        self._in_flight: set[str] = set()
+        self.embedded = 0
+        self.failures = 0
+        self.failed_entities = 0
+        self.last_error: str | None = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self, neo4j_client: Neo4jClient) -> None:
+        """Starts the workers. Entities left pending by a previous run are embedded first."""
+        if self._tasks:
+            return
+        self._neo4j_client = neo4j_client
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(max(1, settings.EMBEDDING_WORKERS))]
+        print(f"Embedding worker started ({len(self._tasks)} tasks).", file=sys.stderr)
+
+    def notify(self) -> None:
+        """Wakes idle workers after a write marked entities pending."""
+        self._wake.set()
+
+    async def stop(self) -> None:
+        """Cancels the workers. Entities being embedded stay pending for the next start."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._in_flight.clear()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "workers": len(self._tasks),
+            "inFlight": len(self._in_flight),
+            "embedded": self.embedded,
+            "failures": self.failures,
+            "failedEntities": self.failed_entities,
+            "lastError": self.last_error,
+        }
+
+    async def _claim(self) -> list[dict]:
+        async with self._claim_lock:
+            records = await self._neo4j_client.pending_embeddings(
+                max(1, settings.EMBEDDING_WORKER_BATCH_SIZE), list(self._in_flight)
+            )
+            self._in_flight.update(record["name"] for record in records)
+            return records
+
+    async def _run(self) -> None:
+        while True:
+            # Cleared before claiming, so a write committed after the claim's
+            # read still wakes this worker
+            self._wake.clear()
+            batch = []
+            try:
+                batch = await self._claim()
+                if not batch:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), settings.EMBEDDING_WORKER_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                embedded = await self._embed(batch)
+                self.embedded += embedded
+                # Vector search results may now include these entities
+                result_cache.invalidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"Embedding worker failed, retrying in {settings.EMBEDDING_WORKER_RETRY_DELAY}s: {e}", file=sys.stderr)
+                await asyncio.sleep(settings.EMBEDDING_WORKER_RETRY_DELAY)
+            finally:
+                self._in_flight.difference_update(record["name"] for record in batch)
+
+    async def _embed(self, batch: list[dict]) -> int:
+        """
+        Embeds a batch, falling back to one entity at a time if it fails.
+        Returns how many entities were embedded. Raises, counting nothing,
+        if the embedding backend is down.
+        """
+        try:
+            await self._neo4j_client.embed_pending(batch)
+            return len(batch)
+        except Exception as e:
+            self.last_error = str(e)
+            failed: list[tuple[dict, Exception]] = [(batch[0], e)] if len(batch) == 1 else []
+
+        embedded = 0
+        if len(batch) > 1:
+            for record in batch:
+                try:
+                    await self._neo4j_client.embed_pending([record])
+                    embedded += 1
+                except Exception as e:
+                    self.last_error = str(e)
+                    failed.append((record, e))
+        # When nothing succeeds, the backend may be down rather than the texts bad
+        if not embedded:
+            try:
+                await check_embedding_backend()
+            except Exception as e:
+                raise RuntimeError(f"Embedding backend unavailable: {e}") from e
+        for record, error in failed:
+            await self._record_failure(record, error)
+        return embedded
+
+    async def _record_failure(self, record: dict, error: Exception) -> None:
+        marked = await self._neo4j_client.record_embedding_failures(
+            [record["name"]], str(error), max(1, settings.EMBEDDING_WORKER_MAX_ATTEMPTS)
+        )
+        self.failed_entities += len(marked)
+        for name in marked:
+            print(f"Embedding worker gave up on entity '{name}': {error}", file=sys.stderr)
+
+
+# Create a single, reusable worker pool
+embedding_worker = EmbeddingWorker()
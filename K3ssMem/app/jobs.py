@@ -0,0 +1,89 @@
+import asyncio
+import sys
+import time
+import uuid
+from typing import Awaitable, Callable
+
+
+class Job:
+    """A long-running operation executed in the background, with progress reporting."""
+
+    def __init__(self, kind: str):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.status = "running"
+        self.progress: dict = {}
+        self.result: dict | None = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    def update(self, **progress) -> None:
+        """Merges new progress values into the job's progress report."""
+        self.progress.update(progress)
+        self.updated_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "jobId": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "updatedAt": self.updated_at,
+            "elapsedMs": (self.updated_at - self.created_at) * 1000,
+        }
+
+
+class JobRegistry:
+    """Starts background jobs and keeps their status in memory for polling."""
+
+    def __init__(self, max_finished: int = 100):
+        self.max_finished = max_finished
+        self._jobs: dict[str, Job] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def start(self, kind: str, run: Callable[[Job], Awaitable[dict]]) -> Job:
+        """Runs run(job) as a background task and returns the job immediately."""
+        job = Job(kind)
+        self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job, run))
+        self._prune()
+        return job
+
+    async def _run(self, job: Job, run: Callable[[Job], Awaitable[dict]]) -> None:
+        try:
+            job.result = await run(job)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+            print(f"Background job {job.id} ({job.kind}) failed: {e}", file=sys.stderr)
+        finally:
+            job.updated_at = time.time()
+            self._tasks.pop(job.id, None)
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        """Forgets the oldest finished jobs beyond max_finished."""
+        finished = [job for job in self._jobs.values() if job.status != "running"]
+        for job in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job.id]
+
+    async def cancel_all(self) -> None:
+        """Cancels running jobs. Called on application shutdown."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Create a single, reusable registry
+jobs = JobRegistry()
@@ -0,0 +1,79 @@
+"""
+Startup and shutdown of the services shared by every transport: the
+embedding client, the Neo4j connection, the schema bootstrap, background
+jobs and the write-behind embedding worker. Used by the FastAPI app and the in-process STDIO server.
+"""
+import asyncio
+import sys
+
+from app.config import settings
+from app.embedding_client import init_embedding_client, close_embedding_client
+from app.embedding_worker import embedding_worker
+from app.jobs import jobs
+from app.metrics import watch_driver
+from app.neo4j_client import Neo4jClient
+from app.schema import ensure_schema, stop_vector_index_retry
+from app.tracing import init_tracing, shutdown_tracing
+
+
+# Schema bootstrap running behind a client that was already handed out
+_schema_task: asyncio.Task | None = None
+
+
+async def _bootstrap_schema(neo4j_client: Neo4jClient) -> None:
+    try:
+        await ensure_schema(neo4j_client)
+    except Exception as e:
+        print(f"Schema bootstrap failed: {e}", file=sys.stderr)
+
+
+async def start_services(background_schema: bool = False) -> Neo4jClient | None:
+    """
+    Opens the embedding client and connects to Neo4j. Returns None if Neo4j
+    is unreachable. With background_schema the schema bootstrap (embedding
+    dimension probe, index creation and db.awaitIndexes) runs after the
+    client is returned instead of before.
+    """
+    global _schema_task
+    init_tracing()
+    await init_embedding_client()
+    neo4j_client = Neo4jClient(uri=settings.NEO4J_URI, user=settings.NEO4J_USER, password=settings.NEO4J_PASSWORD)
+    try:
+        await neo4j_client.verify_connection()
+        print("Successfully connected to Neo4j.", file=sys.stderr)
+    except Exception as e:
+        print(f"Failed to connect to Neo4j: {e}", file=sys.stderr)
+        # In a real app, you might want to prevent startup if the DB is down.
+        await neo4j_client.close()
+        return None
+    watch_driver(neo4j_client.driver)
+
+    if settings.SCHEMA_BOOTSTRAP and background_schema:
+        _schema_task = asyncio.create_task(_bootstrap_schema(neo4j_client))
+    elif settings.SCHEMA_BOOTSTRAP:
+        await _bootstrap_schema(neo4j_client)
+
+    if settings.EMBEDDING_WRITE_BEHIND:
+        embedding_worker.start(neo4j_client)
+
+    return neo4j_client
+
+
+async def stop_services(neo4j_client: Neo4jClient | None) -> None:
+    """
+    Stops the schema bootstrap, background jobs and the embedding worker, closes the Neo4j
+    connection and the embedding client, then flushes traces.
+    """
+    global _schema_task
+    if _schema_task is not None:
+        _schema_task.cancel()
+        await asyncio.gather(_schema_task, return_exceptions=True)
+        _schema_task = None
+    await stop_vector_index_retry()
+    await jobs.cancel_all()
+    await embedding_worker.stop()
+    if neo4j_client:
+        await neo4j_client.close()
+        print("Neo4j connection closed.", file=sys.stderr)
+    await close_embedding_client()
+    shutdown_tracing()
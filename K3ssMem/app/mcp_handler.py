@@ -1,9 +1,50 @@
+import asyncio
+import time
+
+from app import tracing
+from app.config import settings
+from app.metrics import record_tool
 from app.neo4j_client import Neo4jClient
+from app.result_cache import result_cache
+from app.tools import TOOLS, TOOLS_LIST_RESULT
+
+# Tools that only read, and so may run concurrently inside a JSON-RPC batch
+READ_TOOLS = {name for name, tool in TOOLS.items() if tool.read_only}
+
+# Tools that modify the graph and therefore invalidate the result cache
+WRITE_TOOLS = set(TOOLS) - READ_TOOLS
+
+# Methods answered without touching the graph, so before Neo4j is connected
+OFFLINE_METHODS = {"initialize", "notifications/initialized", "tools/list"}
+
+# Concurrency limits per class, so a burst of writes cannot starve searches
+_read_slots = asyncio.Semaphore(settings.TOOL_READ_CONCURRENCY)
+_write_slots = asyncio.Semaphore(settings.TOOL_WRITE_CONCURRENCY)
+
 
 async def handle_mcp_request(request_body: dict, neo4j_client: Neo4jClient) -> dict:
     """
     Handles the incoming MCP request and routes it to the appropriate tool.
     """
+    if not tracing.ENABLED:
+        return await _handle_mcp_request(request_body, neo4j_client)
+
+    method = request_body.get("method")
+    params = request_body.get("params") or {}
+    attributes = {"rpc.system": "jsonrpc", "rpc.method": method}
+    if method == "tools/call":
+        arguments = params.get("arguments") or {}
+        attributes["mcp.tool"] = params.get("name")
+        # Size of the tool's main array argument (entities, relations, names, ...)
+        attributes["mcp.batch_size"] = next((len(value) for value in arguments.values() if isinstance(value, list)), None)
+    with tracing.span("mcp.request", attributes) as current:
+        response = await _handle_mcp_request(request_body, neo4j_client)
+        if response and "error" in response:
+            tracing.set_error(current, response["error"]["message"])
+        return response
+
+
+async def _handle_mcp_request(request_body: dict, neo4j_client: Neo4jClient) -> dict:
     method = request_body.get("method")
     params = request_body.get("params", {})
     request_id = request_body.get("id")
@@ -30,373 +71,129 @@ async def handle_mcp_request(request_body: dict, neo4j_client: Neo4jClient) -> d
         return None
     
     elif method == "tools/list":
-        # Define the tools our server exposes
-        tools = [
-            {
-                "name": "create_entities",
-                "description": "Create multiple new entities in the knowledge graph.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "entities": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "name": {"type": "string"},
-                                    "entityType": {"type": "string"},
-                                    "observations": {"type": "array", "items": {"type": "string"}}
-                                },
-                                "required": ["name", "entityType"]
-                            }
-                        }
-                    },
-                    "required": ["entities"]
-                }
-            },
-            {
-                "name": "semantic_search",
-                "description": "Perform a semantic search for entities in the knowledge graph.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "query": {"type": "string", "description": "The natural language query for semantic search."},
-                        "limit": {"type": "integer", "description": "Maximum number of results to return.", "default": 5}
-                    },
-                    "required": ["query"]
-                }
-            },
-            {
-                "name": "create_relations",
-                "description": "Create multiple new relations between entities in the knowledge graph. Relations should be in active voice.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "relations": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "from": {"type": "string", "description": "The name of the entity where the relation starts"},
-                                    "to": {"type": "string", "description": "The name of the entity where the relation ends"},
-                                    "relationType": {"type": "string", "description": "The type of the relation"},
-                                    "strength": {"type": "number", "description": "Optional strength of relation (0.0 to 1.0)"},
-                                    "confidence": {"type": "number", "description": "Optional confidence level in relation accuracy (0.0 to 1.0)"},
-                                    "metadata": {"type": "object", "description": "Optional metadata about the relation"}
-                                },
-                                "required": ["from", "to", "relationType"]
-                            }
-                        }
-                    },
-                    "required": ["relations"]
-                }
-            },
-            {
-                "name": "add_observations",
-                "description": "Add new observations to existing entities in the knowledge graph.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "observations": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "entityName": {"type": "string", "description": "The name of the entity to add the observations to"},
-                                    "contents": {"type": "array", "items": {"type": "string"}, "description": "An array of observation contents to add"},
-                                    "strength": {"type": "number", "description": "Strength value (0.0 to 1.0) for this specific observation"},
-                                    "confidence": {"type": "number", "description": "Confidence level (0.0 to 1.0) for this specific observation"},
-                                    "metadata": {"type": "object", "description": "Metadata for this specific observation"}
-                                },
-                                "required": ["entityName", "contents"]
-                            }
-                        },
-                        "strength": {"type": "number", "description": "Default strength value (0.0 to 1.0) for all observations"},
-                        "confidence": {"type": "number", "description": "Default confidence level (0.0 to 1.0) for all observations"},
-                        "metadata": {"type": "object", "description": "Default metadata for all observations"}
-                    },
-                    "required": ["observations"]
-                }
-            },
-            {
-                "name": "read_graph",
-                "description": "Read the entire knowledge graph.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {}
-                }
-            },
-            {
-                "name": "open_nodes",
-                "description": "Open specific nodes in the knowledge graph by their names.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "names": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "description": "An array of entity names to retrieve"
-                        }
-                    },
-                    "required": ["names"]
-                }
-            },
-            {
-                "name": "delete_entities",
-                "description": "⚠️ DELETE entities and all their relationships. REQUIRES USER APPROVAL.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "entityNames": {
-                            "type": "array",
-                            "items": {"type": "string"},
-                            "description": "Names of entities to delete"
-                        }
-                    },
-                    "required": ["entityNames"]
-                }
-            },
-            {
-                "name": "delete_relations",
-                "description": "⚠️ DELETE specific relationships between entities. REQUIRES USER APPROVAL.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "relations": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "from": {"type": "string"},
-                                    "to": {"type": "string"},
-                                    "relationType": {"type": "string", "description": "Optional: specific relation type to delete"}
-                                },
-                                "required": ["from", "to"]
-                            }
-                        }
-                    },
-                    "required": ["relations"]
-                }
-            },
-            {
-                "name": "delete_observations",
-                "description": "⚠️ DELETE specific observations from entities. REQUIRES USER APPROVAL.",
-                "inputSchema": {
-                    "type": "object",
-                    "properties": {
-                        "deletions": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "entityName": {"type": "string"},
-                                    "observations": {
-                                        "type": "array",
-                                        "items": {"type": "string"},
-                                        "description": "Specific observations to remove"
-                                    }
-                                },
-                                "required": ["entityName", "observations"]
-                            }
-                        }
-                    },
-                    "required": ["deletions"]
-                }
-            }
-        ]
-        return {"jsonrpc": "2.0", "result": {"tools": tools}, "id": request_id}
+        return {"jsonrpc": "2.0", "result": TOOLS_LIST_RESULT, "id": request_id}
 
     elif method == "tools/call":
         tool_name = params.get("name")
         tool_args = params.get("arguments", {})
 
-        if tool_name == "create_entities":
-            try:
-                entities_to_create = tool_args.get("entities", [])
-                if not entities_to_create:
-                    raise ValueError("The 'entities' array cannot be empty.")
-                
-                created_data = await neo4j_client.create_entities(entities_to_create)
-                
-                return {
-                    "jsonrpc": "2.0",
-                    "result": {"content": [{"type": "text", "text": f"Successfully created {len(created_data)} entities."}]},
-                    "id": request_id
-                }
-            except Exception as e:
-                return {
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32000, "message": f"Error creating entities: {e}"},
-                    "id": request_id
-                }
-        elif tool_name == "semantic_search":
-            try:
-                query = tool_args.get("query")
-                limit = tool_args.get("limit", 5)
-                if not query:
-                    raise ValueError("The 'query' argument cannot be empty.")
-                
-                search_results = await neo4j_client.semantic_search(query, limit)
-                
-                # Format results for MCP response
-                formatted_results = []
-                for record in search_results:
-                    formatted_results.append({
-                        "name": record.get("name"),
-                        "entityType": record.get("entityType"),
-                        "score": record.get("score"),
-                        "observations": record.get("observations")
-                    })
+        started = time.perf_counter()
+        response = await _call_tool_cached(tool_name, tool_args, request_id, neo4j_client)
+        record_tool(tool_name, time.perf_counter() - started, "error" in response)
+        return response
+    else:
+        return {
+            "jsonrpc": "2.0",
+            "error": {"code": -32601, "message": f"Method '{method}' not found"},
+            "id": request_id
+        }
 
-                return {
-                    "jsonrpc": "2.0",
-                    "result": {"content": [{"type": "json", "json": formatted_results}]}, # Return as JSON content
-                    "id": request_id
-                }
-            except Exception as e:
-                return {
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32000, "message": f"Error performing semantic search: {e}"},
-                    "id": request_id
-                }
-        elif tool_name == "create_relations":
-            try:
-                relations_to_create = tool_args.get("relations", [])
-                if not relations_to_create:
-                    raise ValueError("The 'relations' array cannot be empty.")
-                
-                created_relations = await neo4j_client.create_relations(relations_to_create)
-                
-                return {
-                    "jsonrpc": "2.0",
-                    "result": {"content": [{"type": "text", "text": f"Successfully created {len(created_relations)} relations."}]},
-                    "id": request_id
-                }
-            except Exception as e:
-                return {
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32000, "message": f"Error creating relations: {e}"},
-                    "id": request_id
-                }
-        elif tool_name == "add_observations":
-            try:
-                observations_to_add = tool_args.get("observations", [])
-                if not observations_to_add:
-                    raise ValueError("The 'observations' array cannot be empty.")
-                
-                added_observations = await neo4j_client.add_observations(observations_to_add)
-                
-                return {
-                    "jsonrpc": "2.0",
-                    "result": {"content": [{"type": "text", "text": f"Successfully added {len(added_observations)} observations."}]},
-                    "id": request_id
-                }
-            except Exception as e:
-                return {
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32000, "message": f"Error adding observations: {e}"},
-                    "id": request_id
-                }
-        elif tool_name == "read_graph":
-            try:
-                graph_data = await neo4j_client.read_graph()
-                
-                return {
-                    "jsonrpc": "2.0",
-                    "result": {"content": [{"type": "json", "json": graph_data}]},
-                    "id": request_id
-                }
-            except Exception as e:
-                return {
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32000, "message": f"Error reading graph: {e}"},
-                    "id": request_id
-                }
-        elif tool_name == "open_nodes":
-            try:
-                names = tool_args.get("names", [])
-                if not names:
-                    raise ValueError("The 'names' array cannot be empty.")
-                
-                nodes_data = await neo4j_client.open_nodes(names)
-                
-                return {
-                    "jsonrpc": "2.0",
-                    "result": {"content": [{"type": "json", "json": nodes_data}]},
-                    "id": request_id
-                }
-            except Exception as e:
-                return {
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32000, "message": f"Error opening nodes: {e}"},
-                    "id": request_id
-                }
-        elif tool_name == "delete_entities":
-            try:
-                entity_names = tool_args.get("entityNames", [])
-                if not entity_names:
-                    raise ValueError("The 'entityNames' array cannot be empty.")
-                
-                result = await neo4j_client.delete_entities(entity_names)
-                
-                return {
-                    "jsonrpc": "2.0",
-                    "result": {"content": [{"type": "text", "text": f"⚠️ Deleted {result['deleted']} entities: {', '.join(entity_names)}"}]},
-                    "id": request_id
-                }
-            except Exception as e:
-                return {
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32000, "message": f"Error deleting entities: {e}"},
-                    "id": request_id
-                }
-        elif tool_name == "delete_relations":
-            try:
-                relations = tool_args.get("relations", [])
-                if not relations:
-                    raise ValueError("The 'relations' array cannot be empty.")
-                
-                result = await neo4j_client.delete_relations(relations)
-                
-                return {
-                    "jsonrpc": "2.0",
-                    "result": {"content": [{"type": "text", "text": f"⚠️ Deleted {result['deleted']} relationships"}]},
-                    "id": request_id
-                }
-            except Exception as e:
-                return {
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32000, "message": f"Error deleting relations: {e}"},
-                    "id": request_id
-                }
-        elif tool_name == "delete_observations":
-            try:
-                deletions = tool_args.get("deletions", [])
-                if not deletions:
-                    raise ValueError("The 'deletions' array cannot be empty.")
-                
-                result = await neo4j_client.delete_observations(deletions)
-                
-                return {
-                    "jsonrpc": "2.0",
-                    "result": {"content": [{"type": "text", "text": f"⚠️ Deleted {result['deleted']} observations"}]},
-                    "id": request_id
-                }
-            except Exception as e:
-                return {
-                    "jsonrpc": "2.0",
-                    "error": {"code": -32000, "message": f"Error deleting observations: {e}"},
-                    "id": request_id
-                }
-        else:
-            return {
+
+def is_read_request(request_body: dict) -> bool:
+    """Whether a request leaves the graph untouched. Unknown tools count as writes."""
+    if request_body.get("method") != "tools/call":
+        return True
+    tool = TOOLS.get((request_body.get("params") or {}).get("name"))
+    return tool is not None and tool.read_only
+
+
+async def handle_mcp_batch(requests: list, neo4j_client: Neo4jClient) -> list[dict]:
+    """
+    Handles a JSON-RPC 2.0 batch. Consecutive read requests run concurrently;
+    each write waits for the requests before it and blocks the ones after it,
+    so writes keep their order and reads see earlier writes. Responses are
+    returned in request order, without entries for notifications.
+    """
+    responses: list[dict | None] = [None] * len(requests)
+    pending_reads: list[int] = []
+
+    async def handle(index: int) -> None:
+        request_body = requests[index]
+        try:
+            responses[index] = await handle_mcp_request(request_body, neo4j_client)
+        except Exception as e:
+            responses[index] = {
+                "jsonrpc": "2.0",
+                "error": {"code": -32603, "message": f"Internal error: {e}"},
+                "id": request_body.get("id")
+            }
+
+    async def flush_reads() -> None:
+        await asyncio.gather(*(handle(index) for index in pending_reads))
+        pending_reads.clear()
+
+    for index, request_body in enumerate(requests):
+        if not isinstance(request_body, dict):
+            responses[index] = {
                 "jsonrpc": "2.0",
-                "error": {"code": -32601, "message": f"Tool '{tool_name}' not found"},
-                "id": request_id
+                "error": {"code": -32600, "message": "Invalid Request"},
+                "id": None
             }
+        elif is_read_request(request_body):
+            pending_reads.append(index)
+        else:
+            await flush_reads()
+            await handle(index)
+    await flush_reads()
+
+    # Notifications are never answered, even when their method failed
+    return [
+        response for request_body, response in zip(requests, responses)
+        if response is not None and not (isinstance(request_body, dict) and "id" not in request_body)
+    ]
+
+
+async def _call_tool_cached(tool_name: str, tool_args: dict, request_id, neo4j_client: Neo4jClient) -> dict:
+    """Runs a tools/call request through the result cache, invalidating it after writes."""
+    tool = TOOLS.get(tool_name)
+    if settings.RESULT_CACHE_ENABLED and tool is not None and tool.caches(tool_args):
+        cache_key = result_cache.key(tool_name, tool_args)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return {"jsonrpc": "2.0", "result": cached, "id": request_id}
+        generation = result_cache.generation
+        response = await _call_tool(tool_name, tool_args, request_id, neo4j_client)
+        if "result" in response:
+            result_cache.put(cache_key, response["result"], generation)
+        return response
+
+    response = await _call_tool(tool_name, tool_args, request_id, neo4j_client)
+    if tool_name in WRITE_TOOLS:
+        # Invalidate even on error, since a failed write may have partially applied
+        result_cache.invalidate()
+    return response
+
+
+async def _call_tool(tool_name: str, tool_args: dict, request_id, neo4j_client: Neo4jClient) -> dict:
+    """Runs a single tools/call request and wraps its result or error in a JSON-RPC response."""
+    tool = TOOLS.get(tool_name)
+    if tool is None:
+        return {
+            "jsonrpc": "2.0",
+            "error": {"code": -32601, "message": f"Tool '{tool_name}' not found"},
+            "id": request_id
+        }
+
+    if tool.read_only:
+        slots, timeout = _read_slots, settings.TOOL_READ_TIMEOUT
     else:
+        slots, timeout = _write_slots, settings.TOOL_WRITE_TIMEOUT
+    if tool.timeout is not None:
+        timeout = tool.timeout
+
+    try:
+        async with slots:
+            result = await asyncio.wait_for(tool.handler(neo4j_client, tool_args), timeout)
+        return {"jsonrpc": "2.0", "result": result, "id": request_id}
+    except asyncio.TimeoutError:
         return {
             "jsonrpc": "2.0",
-            "error": {"code": -32601, "message": f"Method '{method}' not found"},
+            "error": {"code": -32000, "message": f"{tool.error_message}: timed out after {timeout}s"},
+            "id": request_id
+        }
+    except Exception as e:
+        return {
+            "jsonrpc": "2.0",
+            "error": {"code": -32000, "message": f"{tool.error_message}: {e}"},
             "id": request_id
         }
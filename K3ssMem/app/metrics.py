@@ -0,0 +1,162 @@
+"""
+Prometheus metrics for GET /metrics.
+
+Per-tool request, error and latency metrics, latency per stage (embedding
+calls, Cypher, response serialization), cache counters and Neo4j driver pool
+usage. prometheus_client is optional; without it, or with METRICS_ENABLED
+off, every recording function is a no-op.
+"""
+import time
+from contextlib import contextmanager
+
+from app.config import settings
+
+try:
+    import prometheus_client
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:
+    prometheus_client = None
+
+ENABLED = prometheus_client is not None and settings.METRICS_ENABLED
+
+# Latency buckets from 1 ms to 30 s
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+if ENABLED:
+    _registry = prometheus_client.CollectorRegistry()
+    _tool_requests = prometheus_client.Counter(
+        "borg_tool_requests", "tools/call requests", ["tool"], registry=_registry
+    )
+    _tool_errors = prometheus_client.Counter(
+        "borg_tool_errors", "tools/call requests answered with an error", ["tool"], registry=_registry
+    )
+    _tool_latency = prometheus_client.Histogram(
+        "borg_tool_duration_seconds", "tools/call latency, including result cache hits",
+        ["tool"], buckets=_BUCKETS, registry=_registry
+    )
+    _stage_latency = prometheus_client.Histogram(
+        "borg_stage_duration_seconds", "Time spent per stage: embedding requests, Cypher sessions, response serialization",
+        ["stage"], buckets=_BUCKETS, registry=_registry
+    )
+    _embedded_texts = prometheus_client.Counter(
+        "borg_embedding_texts", "Texts sent to the embedding service", registry=_registry
+    )
+
+
+def tool_label(tool_name) -> str:
+    """Keeps label cardinality bounded: unregistered tool names are reported as 'unknown'."""
+    from app.tools import TOOLS
+
+    return tool_name if tool_name in TOOLS else "unknown"
+
+
+def record_tool(tool_name, seconds: float, error: bool) -> None:
+    if not ENABLED:
+        return
+    label = tool_label(tool_name)
+    _tool_requests.labels(label).inc()
+    _tool_latency.labels(label).observe(seconds)
+    if error:
+        _tool_errors.labels(label).inc()
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    if ENABLED:
+        _stage_latency.labels(stage).observe(seconds)
+
+
+@contextmanager
+def time_stage(stage: str):
+    """Records the duration of the enclosed block under the given stage, even if it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def count_embedded_texts(count: int) -> None:
+    if ENABLED:
+        _embedded_texts.inc(count)
+
+
+class _StateCollector:
+    """Reports cache counters, write-behind worker progress and driver pool usage at scrape time."""
+
+    def __init__(self):
+        self.driver = None
+
+    def collect(self):
+        from app.embedding_cache import embedding_cache
+        from app.result_cache import result_cache
+
+        embedding_stats = embedding_cache.stats()
+        lookups = CounterMetricFamily(
+            "borg_embedding_cache_lookups", "Embedding cache lookups by outcome", labels=["result"]
+        )
+        lookups.add_metric(["memory_hit"], embedding_stats["hits"])
+        lookups.add_metric(["disk_hit"], embedding_stats["diskHits"])
+        lookups.add_metric(["miss"], embedding_stats["misses"])
+        yield lookups
+        yield GaugeMetricFamily("borg_embedding_cache_hit_ratio", "Embedding cache hit ratio since start", value=embedding_stats["hitRate"])
+        yield GaugeMetricFamily("borg_embedding_cache_bytes", "Memory used by cached embedding vectors", value=embedding_stats["bytes"])
+
+        result_stats = result_cache.stats()
+        result_lookups = CounterMetricFamily(
+            "borg_result_cache_lookups", "Result cache lookups by outcome", labels=["result"]
+        )
+        result_lookups.add_metric(["hit"], result_stats["hits"])
+        result_lookups.add_metric(["miss"], result_stats["misses"])
+        yield result_lookups
+        yield GaugeMetricFamily("borg_result_cache_hit_ratio", "Result cache hit ratio since start", value=result_stats["hitRate"])
+        yield GaugeMetricFamily("borg_result_cache_entries", "Results currently cached", value=result_stats["entries"])
+        yield GaugeMetricFamily("borg_result_cache_bytes", "Serialized size of the cached results", value=result_stats["bytes"])
+
+        from app.embedding_worker import embedding_worker
+
+        if embedding_worker.running:
+            worker_stats = embedding_worker.stats()
+            yield CounterMetricFamily("borg_embedding_worker_embedded", "Pending entities embedded by the write-behind worker", value=worker_stats["embedded"])
+            yield CounterMetricFamily("borg_embedding_worker_failures", "Failed write-behind embedding batches", value=worker_stats["failures"])
+            yield CounterMetricFamily("borg_embedding_worker_failed_entities", "Entities the write-behind worker marked failed", value=worker_stats["failedEntities"])
+            yield GaugeMetricFamily("borg_embedding_worker_in_flight", "Entities currently being embedded by the worker", value=worker_stats["inFlight"])
+
+        yield from self._collect_pool()
+
+    def _collect_pool(self):
+        # The driver has no public pool API; read its pool defensively
+        pool = getattr(self.driver, "_pool", None)
+        if pool is None:
+            return
+        connections_by_state = GaugeMetricFamily(
+            "borg_neo4j_pool_connections", "Neo4j driver connections by state", labels=["address", "state"]
+        )
+        try:
+            for address, connections in list(pool.connections.items()):
+                busy = sum(1 for connection in list(connections) if connection.in_use)
+                connections_by_state.add_metric([str(address), "in_use"], busy)
+                connections_by_state.add_metric([str(address), "idle"], len(connections) - busy)
+            max_size = pool.pool_config.max_connection_pool_size
+        except AttributeError:
+            return
+        yield connections_by_state
+        yield GaugeMetricFamily("borg_neo4j_pool_max_size", "Maximum connections per address", value=max_size)
+
+    def describe(self):
+        # Metric names vary with the pool's addresses; skip the collect() call at registration
+        return []
+
+
+_state = _StateCollector()
+if ENABLED:
+    _registry.register(_state)
+
+
+def watch_driver(driver) -> None:
+    """Reports the connection pool of the given Neo4j driver."""
+    _state.driver = driver
+
+
+def render() -> tuple[bytes, str]:
+    """Returns the metrics in the Prometheus text format and its content type."""
+    return prometheus_client.generate_latest(_registry), prometheus_client.CONTENT_TYPE_LATEST
@@ -1,10 +1,79 @@
-from neo4j import AsyncGraphDatabase, AsyncDriver
+import asyncio
+import re
+from contextlib import asynccontextmanager
+from neo4j import AsyncGraphDatabase, AsyncDriver, READ_ACCESS, WRITE_ACCESS
+from neo4j.exceptions import ConstraintError
+
+from app import tracing
+from app.config import settings
+from app.metrics import time_stage
+
+SEARCH_MODES = ("vector", "fulltext", "hybrid")
+
+# Characters with special meaning in Lucene query syntax
+_LUCENE_SPECIAL = set('+-&|!(){}[]^"~*?:\\/')
+# Boolean operators, which Lucene only recognises in upper case
+_LUCENE_OPERATORS = re.compile(r"\b(AND|OR|NOT)\b")
+
+
+def escape_lucene(text: str) -> str:
+    """Escapes Lucene syntax so user queries are matched as plain terms."""
+    escaped = "".join(f"\\{char}" if char in _LUCENE_SPECIAL else char for char in text)
+    # The analyzer lowercases terms anyway, so this only stops them acting as operators
+    return _LUCENE_OPERATORS.sub(lambda match: match.group().lower(), escaped)
+
+
+def fuse_rankings(rankings: list[list[dict]], weights: list[float], k: int = 60) -> list[dict]:
+    """
+    Fuses ranked result lists with weighted reciprocal rank fusion: an entity
+    scores the sum of weight / (k + rank) over the lists it appears in.
+    Results are keyed by name and keep the fields of their first occurrence.
+    """
+    fused: dict[str, dict] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, record in enumerate(ranking, start=1):
+            entry = fused.setdefault(record["name"], {**record, "score": 0.0})
+            entry["score"] += weight / (k + rank)
+    return sorted(fused.values(), key=lambda record: record["score"], reverse=True)
+
+
+# Entity properties that read_graph can project
+ENTITY_FIELDS = ("name", "entityType", "observations")
+
+
+def normalize_entity_fields(fields: list[str] | None) -> list[str]:
+    """
+    Validates a read_graph field projection. Defaults to all fields and always
+    includes name, since it is the pagination cursor.
+    """
+    fields = list(fields) if fields else list(ENTITY_FIELDS)
+    unknown = [field for field in fields if field not in ENTITY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown entity fields: {', '.join(unknown)}. Allowed: {', '.join(ENTITY_FIELDS)}")
+    if "name" not in fields:
+        fields.insert(0, "name")
+    return fields
+
+async def _fetch_data(tx, query: str, params: dict) -> list[dict]:
+    """Transaction function returning every record of a query as a dict."""
+    result = await tx.run(query, params)
+    return await result.data()
 
 class Neo4jClient:
     """A client for interacting with a Neo4j database."""
 
     def __init__(self, uri, user, password):
-        self.driver: AsyncDriver = AsyncGraphDatabase.driver(uri, auth=(user, password))
+        self.driver: AsyncDriver = AsyncGraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_connection_pool_size=settings.NEO4J_MAX_CONNECTION_POOL_SIZE,
+            connection_acquisition_timeout=settings.NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+            max_connection_lifetime=settings.NEO4J_MAX_CONNECTION_LIFETIME,
+            max_transaction_retry_time=settings.NEO4J_MAX_TRANSACTION_RETRY_TIME,
+        )
+        # Shared by every session, so a read routed to a follower waits until
+        # the follower has applied this client's earlier writes
+        self.bookmarks = AsyncGraphDatabase.bookmark_manager() if settings.NEO4J_CAUSAL_CONSISTENCY else None
 
     async def close(self):
         """Closes the connection to the database."""
@@ -18,21 +87,212 @@ class Neo4jClient:
             print(f"Failed to verify connectivity: {e}")
             raise
 
+    def _session_config(self, **config) -> dict:
+        """Options shared by every session: the target database and the bookmark manager."""
+        # Naming the database saves a home-database lookup per session
+        config.setdefault("database", settings.NEO4J_DATABASE)
+        if self.bookmarks is not None:
+            config.setdefault("bookmark_manager", self.bookmarks)
+        return config
+
+    @asynccontextmanager
+    async def _session(self, **config):
+        """
+        Opens a session, recording its lifetime as Cypher time in the metrics
+        and, when tracing is enabled, a span per statement.
+        """
+        with time_stage("cypher"):
+            async with self.driver.session(**self._session_config(**config)) as session:
+                yield tracing.TracedSession(session) if tracing.ENABLED else session
+
+    async def _read_transaction(self, work, *args):
+        """
+        Runs work(tx, *args) in a managed read transaction, retried on transient
+        errors. With a neo4j:// URI it is routed to a follower or read replica.
+        """
+        if not settings.NEO4J_ROUTE_READS:
+            return await self._write_transaction(work, *args)
+        async with self._session(default_access_mode=READ_ACCESS) as session:
+            return await session.execute_read(work, *args)
+
+    async def _write_transaction(self, work, *args):
+        """Runs work(tx, *args) in a managed write transaction on the leader, retried on transient errors."""
+        async with self._session(default_access_mode=WRITE_ACCESS) as session:
+            return await session.execute_write(work, *args)
+
+    async def _read(self, query: str, params: dict = None) -> list[dict]:
+        """Runs a read-only query in a managed read transaction and returns its records."""
+        return await self._read_transaction(_fetch_data, query, params or {})
+
+    async def _write(self, query: str, params: dict = None) -> list[dict]:
+        """Runs a query in a managed write transaction and returns its records."""
+        return await self._write_transaction(_fetch_data, query, params or {})
+
     async def execute_query(self, query: str, params: dict = None):
-        """Executes a given Cypher query."""
+        """
+        Executes a given Cypher query in an auto-commit transaction, as schema
+        commands and procedures like db.awaitIndexes require.
+        """
         params = params or {}
-        async with self.driver.session() as session:
+        async with self._session() as session:
             result = await session.run(query, params)
             return await result.data()
 
-    async def semantic_search(self, query: str, limit: int = 5) -> list[dict]:
-        """Performs a semantic search for entities in the Neo4j database."""
+    async def semantic_search(
+        self,
+        query: str,
+        limit: int = 5,
+        search_mode: str = "vector",
+        candidates: int | None = None,
+        vector_weight: float | None = None,
+        text_weight: float | None = None,
+        expand_hops: int = 0,
+        max_neighbors: int = 10,
+        include_pending: bool = False,
+    ) -> list[dict]:
+        """
+        Searches entities in the Neo4j database.
+
+        search_mode "vector" ranks by embedding similarity, "fulltext" by the
+        full-text index over name and observations, and "hybrid" runs both
+        concurrently over a pool of candidates and fuses the two rankings with
+        weighted reciprocal rank fusion.
+
+        With expand_hops > 0 every hit also carries up to max_neighbors
+        entities within that many RELATES_TO hops, plus the relations that
+        reach them. A neighbor scores the hit's score times the product of
+        strength * confidence along its best path.
+
+        With include_pending, vector search also matches entities still
+        waiting for their embedding by full text, fusing them in like hybrid
+        mode does. The other modes already find them through the full-text index.
+        """
+
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search_mode '{search_mode}'. Allowed: {', '.join(SEARCH_MODES)}")
+        if expand_hops and not 0 < expand_hops <= settings.EXPAND_MAX_HOPS:
+            raise ValueError(f"expand_hops must be between 1 and {settings.EXPAND_MAX_HOPS}")
+
+        # Vector hits and their neighborhoods come from a single query
+        if search_mode == "vector" and not include_pending:
+            return await self._vector_search(query, limit, expand_hops, max_neighbors)
+
+        if search_mode == "vector":
+            results, pending_results = await asyncio.gather(
+                self._vector_search(query, limit),
+                self._pending_search(query, limit),
+            )
+            if pending_results:
+                results = fuse_rankings(
+                    [results, pending_results],
+                    [settings.HYBRID_VECTOR_WEIGHT, settings.HYBRID_TEXT_WEIGHT],
+                    k=settings.HYBRID_RRF_K,
+                )[:limit]
+        elif search_mode == "fulltext":
+            results = await self._fulltext_search(query, limit)
+        else:
+            pool = max(limit, candidates or settings.HYBRID_CANDIDATES)
+            vector_results, text_results = await asyncio.gather(
+                self._vector_search(query, pool),
+                self._fulltext_search(query, pool),
+            )
+            results = fuse_rankings(
+                [vector_results, text_results],
+                [
+                    settings.HYBRID_VECTOR_WEIGHT if vector_weight is None else vector_weight,
+                    settings.HYBRID_TEXT_WEIGHT if text_weight is None else text_weight,
+                ],
+                k=settings.HYBRID_RRF_K,
+            )[:limit]
+
+        if expand_hops and results:
+            return await self._expand_hits(results, expand_hops, max_neighbors)
+        return results
+
+    @staticmethod
+    def _neighborhood_clause(expand_hops: int) -> str:
+        """
+        Builds the Cypher that follows a (node, score) row with the node's
+        expansion and returns the search result.
+
+        The expansion walks one hop at a time and only continues from the
+        $maxNeighbors best-weighted entities reached by the previous hop, so
+        its cost grows with the degree of those entities rather than with
+        degree^hops. Each entity is reached once, through its best path at
+        the lowest hop; the top $maxNeighbors by weight are returned.
+        """
+        if not expand_hops:
+            return """
+            RETURN node.name AS name, node.entityType AS entityType, score, node.observations AS observations
+            ORDER BY score DESC
+            """
+        hop = """
+            CALL {
+                WITH frontier, seen
+                UNWIND frontier AS item
+                WITH seen, item, item.neighbor AS source
+                MATCH (source)-[r:RELATES_TO]-(next:Entity)
+                WHERE NOT next IN seen
+                WITH next, item.rels + r AS rels,
+                     item.weight * coalesce(r.strength, 1.0) * coalesce(r.confidence, 1.0) AS weight
+                ORDER BY weight DESC
+                WITH next, collect({rels: rels, weight: weight})[0] AS best
+                ORDER BY best.weight DESC
+                LIMIT $maxNeighbors
+                RETURN collect({neighbor: next, rels: best.rels, weight: best.weight}) AS reached
+            }
+            WITH node, reached AS frontier, seen + [item IN reached | item.neighbor] AS seen,
+                 expansion + reached AS expansion
+        """
+        # Hops are unrolled; expand_hops is validated against EXPAND_MAX_HOPS
+        return """
+        CALL {
+            WITH node
+            WITH node, [{neighbor: node, rels: [], weight: 1.0}] AS frontier, [node] AS seen, [] AS expansion
+        """ + hop * int(expand_hops) + """
+            UNWIND expansion AS item
+            WITH item
+            ORDER BY item.weight DESC
+            LIMIT $maxNeighbors
+            RETURN collect(item) AS expansion
+        }
+        RETURN node.name AS name, node.entityType AS entityType, score, node.observations AS observations,
+               [item IN expansion | {
+                   name: item.neighbor.name,
+                   entityType: item.neighbor.entityType,
+                   observations: item.neighbor.observations,
+                   hops: size(item.rels),
+                   score: score * item.weight
+               }] AS neighbors,
+               [item IN expansion | [r IN item.rels | {
+                   from: startNode(r).name,
+                   to: endNode(r).name,
+                   relationType: r.relationType,
+                   strength: r.strength,
+                   confidence: r.confidence
+               }]] AS relationPaths
+        ORDER BY score DESC
+        """
+
+    @staticmethod
+    def _collect_neighborhoods(records: list[dict]) -> list[dict]:
+        """Flattens each hit's relation paths into a de-duplicated relations list."""
+        for record in records:
+            if "relationPaths" not in record:
+                continue
+            relations = {}
+            for path in record.pop("relationPaths"):
+                for relation in path:
+                    relations.setdefault((relation["from"], relation["to"], relation["relationType"]), relation)
+            record["relations"] = list(relations.values())
+        return records
+
+    async def _vector_search(self, query: str, limit: int, expand_hops: int = 0, max_neighbors: int = 10) -> list[dict]:
+        """Ranks entities by similarity between their embedding and the query's."""
         from app.embedding_client import get_embedding
 
         # 1. Get embedding for the query
         query_embedding = await get_embedding(query)
-        if not query_embedding:
-            return []
 
         # 2. Perform vector similarity search in Neo4j
         # This Cypher query is adapted from memento-mcp's Neo4jVectorStore.ts
@@ -43,16 +303,94 @@ class Neo4jClient:
             $embedding
         )
         YIELD node, score
+        """ + self._neighborhood_clause(expand_hops)
+        
+        records = await self._read(search_query, {
+            "limit": limit,
+            "embedding": query_embedding,
+            "maxNeighbors": max_neighbors
+        })
+        return self._collect_neighborhoods(records)
+
+    async def _expand_hits(self, hits: list[dict], expand_hops: int, max_neighbors: int) -> list[dict]:
+        """Adds neighborhoods to hits found by a non-vector search, keeping their scores."""
+        expand_query = """
+        UNWIND $seeds AS seed
+        MATCH (node:Entity {name: seed.name})
+        WITH node, seed.score AS score
+        """ + self._neighborhood_clause(expand_hops)
+        
+        seeds = [{"name": hit["name"], "score": hit["score"]} for hit in hits]
+        records = await self._read(expand_query, {"seeds": seeds, "maxNeighbors": max_neighbors})
+        return self._collect_neighborhoods(records)
+
+    async def _fulltext_search(self, query: str, limit: int) -> list[dict]:
+        """Ranks entities by keyword match on name and observations."""
+        lucene_query = escape_lucene(query)
+        if not lucene_query.strip():
+            return []
+
+        search_query = """
+        CALL db.index.fulltext.queryNodes('entity_fulltext', $query, {limit: $limit})
+        YIELD node, score
         RETURN node.name AS name, node.entityType AS entityType, score, node.observations AS observations
         ORDER BY score DESC
         """
         
-        async with self.driver.session() as session:
-            result = await session.run(search_query, {"limit": limit, "embedding": query_embedding})
-            return await result.data()
+        return await self._read(search_query, {"query": lucene_query, "limit": limit})
+
+    async def _pending_search(self, query: str, limit: int) -> list[dict]:
+        """Ranks entities whose embedding is pending by keyword match on name and observations."""
+        lucene_query = escape_lucene(query)
+        if not lucene_query.strip():
+            return []
+
+        # The index yields nodes best match first, so the filter stops at limit pending hits
+        search_query = """
+        CALL db.index.fulltext.queryNodes('entity_fulltext', $query)
+        YIELD node, score
+        WHERE node.embeddingStatus = 'pending'
+        RETURN node.name AS name, node.entityType AS entityType, score, node.observations AS observations
+        LIMIT $limit
+        """
+
+        return await self._read(search_query, {"query": lucene_query, "limit": limit})
+
+    async def _embed_observation_lists(self, observation_lists: list[list[str]]) -> list[tuple[list[float], int | None]]:
+        """
+        Embeds the observations of several entities concurrently.
+
+        Returns (embedding, embeddingCount) per entity. By default the
+        observations are joined with newlines and embedded as one text, and
+        embeddingCount is None. With OBSERVATION_EMBEDDINGS enabled each
+        observation is embedded on its own and the entity embedding is their
+        mean over embeddingCount observations.
+        """
+        from app.embedding_client import get_embeddings, mean_embedding
+
+        if not settings.OBSERVATION_EMBEDDINGS:
+            vectors = await get_embeddings(['\n'.join(observations) for observations in observation_lists])
+            return [(vector, None) for vector in vectors]
+
+        # Entities without observations fall back to embedding the empty text
+        texts = [text for observations in observation_lists for text in (observations or [""])]
+        vectors = await get_embeddings(texts)
+        embeddings = []
+        offset = 0
+        for observations in observation_lists:
+            size = len(observations or [""])
+            embeddings.append((mean_embedding(vectors[offset:offset + size]), len(observations)))
+            offset += size
+        return embeddings
 
     async def create_entities(self, entities: list[dict]):
-        """Creates new entities in the Neo4j database."""
+        """
+        Creates new entities in the Neo4j database.
+
+        Names are unique, so names that already exist or repeat within the
+        call are rejected with a ValueError before anything is embedded or
+        written; upsert_entities merges into existing entities instead.
+        """
         # This query is a direct translation of the one in memento-mcp
         create_query = """
         UNWIND $entities as entity_data
@@ -62,6 +400,8 @@ class Neo4jClient:
             entityType: entity_data.entityType,
             observations: entity_data.observations,
             embedding: entity_data.embedding,
+            embeddingCount: entity_data.embeddingCount,
+            embeddingStatus: entity_data.embeddingStatus,
             version: 1,
             createdAt: timestamp(),
             updatedAt: timestamp(),
@@ -72,233 +412,697 @@ class Neo4jClient:
         RETURN e
         """
         
-        from app.embedding_client import get_embedding
         import uuid
 
-        entities_to_create = []
-        for entity in entities:
-            # Create the text to be embedded from observations
-            text_to_embed = '\n'.join(entity.get("observations", []))
-            
-            # Get the embedding vector (placeholder for local model call)
-            embedding_vector = await get_embedding(text_to_embed)
+        await self._check_new_names([entity["name"] for entity in entities])
+
+        write_behind = settings.EMBEDDING_WRITE_BEHIND
+        if write_behind:
+            # Committed without embeddings; the embedding worker fills them in
+            embeddings = [(None, None)] * len(entities)
+        else:
+            # Embed all entities through the batched, concurrent pipeline
+            # instead of one call per entity
+            embeddings = await self._embed_observation_lists(
+                [entity.get("observations", []) for entity in entities]
+            )
 
+        entities_to_create = []
+        for entity, (embedding_vector, embedding_count) in zip(entities, embeddings):
             entities_to_create.append({
                 "id": str(uuid.uuid4()),
                 "name": entity["name"],
                 "entityType": entity["entityType"],
                 "observations": entity.get("observations", []),
                 "embedding": embedding_vector,
+                "embeddingCount": embedding_count,
+                "embeddingStatus": "pending" if write_behind else None,
             })
 
         if not entities_to_create:
             return []
 
-        async with self.driver.session() as session:
-            result = await session.run(create_query, {"entities": entities_to_create})
-            return await result.data()
+        try:
+            created = await self._write(create_query, {"entities": entities_to_create})
+        except ConstraintError as e:
+            # An entity with one of the names was created since the check
+            raise ValueError(f"{e.message} Pass upsert: true to merge into existing entities.") from e
+        if write_behind:
+            self._notify_embedding_worker()
+        return created
+
+    async def _check_new_names(self, names: list[str]) -> None:
+        """Raises ValueError naming the entities that exist already or are given twice."""
+        seen, repeated = set(), []
+        for name in names:
+            if name in seen and name not in repeated:
+                repeated.append(name)
+            seen.add(name)
+        if repeated:
+            raise ValueError(f"Entity names given more than once: {', '.join(repeated)}")
+
+        records = await self._read(
+            "MATCH (e:Entity) WHERE e.name IN $names RETURN DISTINCT e.name AS name", {"names": list(seen)}
+        )
+        if records:
+            existing = ", ".join(record["name"] for record in records)
+            raise ValueError(f"Entities already exist: {existing}. Pass upsert: true to merge into them.")
+
+    async def upsert_entities(self, entities: list[dict], match_entity_type: bool = False) -> dict:
+        """
+        Creates entities that do not exist yet and merges the observations of
+        those that do, keyed on name, so re-sending an entity never duplicates it.
+
+        Existing entities take the given entityType and gain the observations
+        they lack, in order. Only new entities, entities that gained
+        observations and entities whose embedding is still pending (e.g.
+        after an embedding failure) are embedded. With match_entity_type, an entity whose
+        name exists with a different entityType is skipped instead of updated,
+        as names are unique. Returns the names created, updated, unchanged and skipped.
+        """
+        import uuid
+
+        # Combine entities sent twice in one call, keeping the last entityType
+        merged_entities: dict[str, dict] = {}
+        for entity in entities:
+            merged = merged_entities.setdefault(entity["name"], {"observations": []})
+            merged["entityType"] = entity["entityType"]
+            merged["observations"].extend(
+                obs for obs in entity.get("observations", []) if obs not in merged["observations"]
+            )
+
+        if not merged_entities:
+            return {"created": [], "updated": [], "unchanged": [], "skipped": []}
+
+        # New entities and entities that gained observations are marked
+        # pending in the same write and cleared once embedded, so an
+        # embedding failure leaves them pending and a retry embeds them.
+        # MERGE takes the node's write lock (_lock also records whether it
+        # was created) before its observations are read, so concurrent
+        # upserts into one entity cannot lose each other's updates.
+        upsert_query = """
+        UNWIND $entities AS entity
+        MERGE (e:Entity {name: entity.name})
+        ON CREATE SET e._lock = 'created',
+            e.id = entity.id,
+            e.version = 1,
+            e.createdAt = timestamp(),
+            e.validFrom = timestamp(),
+            e.validTo = null,
+            e.changedBy = null
+        ON MATCH SET e._lock = 'matched'
+        WITH entity, e, e._lock = 'created' AS created
+        REMOVE e._lock
+        WITH entity, e, created
+        WHERE created OR NOT $matchEntityType OR e.entityType = entity.entityType
+        WITH e, entity, created, coalesce(e.observations, []) AS before,
+             e.entityType AS previousType, coalesce(e.embeddingStatus = 'pending', false) AS pending
+        WITH e, entity, created, before, previousType, pending,
+             reduce(merged = before, obs IN entity.observations |
+                CASE WHEN obs IN merged THEN merged ELSE merged + obs END) AS merged
+        WITH e, entity, created, before, merged, pending,
+             created OR size(merged) > size(before) OR previousType <> entity.entityType AS changed
+        SET e.updatedAt = CASE WHEN changed THEN timestamp() ELSE e.updatedAt END,
+            e.embeddingStatus = CASE WHEN created OR size(merged) > size(before)
+                THEN 'pending' ELSE e.embeddingStatus END,
+            e.entityType = entity.entityType,
+            e.observations = merged
+        RETURN e.name AS name,
+               created,
+               changed,
+               pending,
+               merged AS observations,
+               [obs IN merged WHERE NOT obs IN before] AS added,
+               CASE WHEN $observationEmbeddings AND NOT pending THEN e.embedding END AS embedding,
+               e.embeddingCount AS embeddingCount
+        """
+
+        params = [
+            {"id": str(uuid.uuid4()), "name": name, "entityType": entity["entityType"], "observations": entity["observations"]}
+            for name, entity in merged_entities.items()
+        ]
+        records = await self._write(upsert_query, {
+            "entities": params,
+            "matchEntityType": match_entity_type,
+            "observationEmbeddings": settings.OBSERVATION_EMBEDDINGS
+        })
+
+        # New entities are embedded even without observations, as create_entities does
+        await self._refresh_embeddings([
+            record for record in records if record["created"] or record["added"] or record["pending"]
+        ])
+
+        found = {record["name"] for record in records}
+        return {
+            "created": [record["name"] for record in records if record["created"]],
+            "updated": [record["name"] for record in records if record["changed"] and not record["created"]],
+            "unchanged": [record["name"] for record in records if not record["changed"]],
+            "skipped": [name for name in merged_entities if name not in found],
+        }
 
     async def create_relations(self, relations: list[dict]) -> list[dict]:
         """Creates new relations between entities in the Neo4j database."""
+        result = await self.create_relations_detailed(relations)
+        return result["created"]
+
+    async def create_relations_detailed(self, relations: list[dict]) -> dict:
+        """
+        Creates new relations in a single UNWIND query and reports which were
+        skipped because an endpoint entity does not exist.
+        """
         if not relations:
-            return []
+            return {"created": [], "skipped": []}
 
         import uuid
-        
+
+        # Every relation is matched and created in one round trip. The unit
+        # subquery only runs CREATE when both endpoints were found, and always
+        # returns a row so skipped relations are reported too.
+        create_query = """
+        UNWIND $relations AS rel
+        OPTIONAL MATCH (from:Entity {name: rel.fromName})
+        OPTIONAL MATCH (to:Entity {name: rel.toName})
+        CALL {
+            WITH rel, from, to
+            WITH rel, from, to
+            WHERE from IS NOT NULL AND to IS NOT NULL
+            CREATE (from)-[r:RELATES_TO {
+                id: rel.id,
+                relationType: rel.relationType,
+                strength: rel.strength,
+                confidence: rel.confidence,
+                metadata: rel.metadata,
+                version: 1,
+                createdAt: timestamp(),
+                updatedAt: timestamp(),
+                validFrom: timestamp(),
+                validTo: null,
+                changedBy: rel.changedBy
+            }]->(to)
+            RETURN count(r) AS createdCount
+        }
+        RETURN rel.index AS index, from.name AS fromName, to.name AS toName, createdCount
+        """
+
+        params = [
+            {
+                "index": index,
+                "id": str(uuid.uuid4()),
+                "fromName": relation["from"],
+                "toName": relation["to"],
+                "relationType": relation["relationType"],
+                "strength": relation.get("strength"),
+                "confidence": relation.get("confidence"),
+                "metadata": str(relation.get("metadata")) if relation.get("metadata") else None,
+                "changedBy": relation.get("changedBy")
+            }
+            for index, relation in enumerate(relations)
+        ]
+
+        records = await self._write(create_query, {"relations": params})
+
+        # Duplicate entity names can yield several rows per relation
+        endpoints = {}
+        for record in records:
+            if record["createdCount"] and record["index"] not in endpoints:
+                endpoints[record["index"]] = (record["fromName"], record["toName"])
+
         created_relations = []
-        
-        async with self.driver.session() as session:
-            tx = await session.begin_transaction()
-            try:
-                for relation in relations:
-                    # Generate unique ID
-                    relation_id = str(uuid.uuid4())
-                    
-                    # Check if both entities exist
-                    check_query = """
-                    MATCH (from:Entity {name: $fromName})
-                    MATCH (to:Entity {name: $toName})
-                    RETURN from, to
-                    """
-                    
-                    check_result = await tx.run(check_query, {
-                        "fromName": relation["from"],
-                        "toName": relation["to"]
-                    })
-                    
-                    records = await check_result.data()
-                    
-                    # Skip if either entity doesn't exist
-                    if not records:
-                        print(f"Warning: Skipping relation - entities not found ({relation['from']} -> {relation['to']})")
-                        continue
-                    
-                    # Create the relation
-                    create_query = """
-                    MATCH (from:Entity {name: $fromName})
-                    MATCH (to:Entity {name: $toName})
-                    CREATE (from)-[r:RELATES_TO {
-                        id: $id,
-                        relationType: $relationType,
-                        strength: $strength,
-                        confidence: $confidence,
-                        metadata: $metadata,
-                        version: 1,
-                        createdAt: timestamp(),
-                        updatedAt: timestamp(),
-                        validFrom: timestamp(),
-                        validTo: null,
-                        changedBy: $changedBy
-                    }]->(to)
-                    RETURN r, from.name AS fromName, to.name AS toName
-                    """
-                    
-                    params = {
-                        "id": relation_id,
-                        "fromName": relation["from"],
-                        "toName": relation["to"],
-                        "relationType": relation["relationType"],
-                        "strength": relation.get("strength"),
-                        "confidence": relation.get("confidence"),
-                        "metadata": str(relation.get("metadata")) if relation.get("metadata") else None,
-                        "changedBy": relation.get("changedBy")
-                    }
-                    
-                    result = await tx.run(create_query, params)
-                    result_data = await result.data()
-                    
-                    if result_data:
-                        record = result_data[0]
-                        
-                        created_relation = {
-                            "from": record["fromName"],
-                            "to": record["toName"],
-                            "relationType": relation["relationType"],
-                            "strength": relation.get("strength"),
-                            "confidence": relation.get("confidence"),
-                            "metadata": relation.get("metadata")
-                        }
-                        created_relations.append(created_relation)
-                
-                await tx.commit()
-            except Exception as e:
-                await tx.rollback()
-                raise e
-        
-        return created_relations
+        skipped_relations = []
+        for index, relation in enumerate(relations):
+            if index not in endpoints:
+                print(f"Warning: Skipping relation - entities not found ({relation['from']} -> {relation['to']})")
+                skipped_relations.append({
+                    "from": relation["from"],
+                    "to": relation["to"],
+                    "relationType": relation["relationType"]
+                })
+                continue
+
+            from_name, to_name = endpoints[index]
+            created_relations.append({
+                "from": from_name,
+                "to": to_name,
+                "relationType": relation["relationType"],
+                "strength": relation.get("strength"),
+                "confidence": relation.get("confidence"),
+                "metadata": relation.get("metadata")
+            })
+
+        return {"created": created_relations, "skipped": skipped_relations}
+
+    async def _update_embeddings(self, changed: list[dict]) -> None:
+        """
+        Re-embeds entities whose observations changed, given records with their
+        name, merged observations, the added observations and, with
+        OBSERVATION_EMBEDDINGS, the stored embedding and embeddingCount.
+        """
+        from app.embedding_client import get_embeddings, mean_embedding
+
+        if not changed:
+            return
+
+        # Entities whose previous embedding is a mean over their observations
+        # only need the new observations embedded; all others are re-embedded whole
+        incremental, full = [], []
+        for record in changed:
+            is_mean = record["embedding"] is not None and record["embeddingCount"] is not None
+            (incremental if settings.OBSERVATION_EMBEDDINGS and is_mean else full).append(record)
+
+        added_vectors, full_embeddings = await asyncio.gather(
+            get_embeddings([obs for record in incremental for obs in record["added"]]),
+            self._embed_observation_lists([record["observations"] for record in full]),
+        )
+
+        updates = []
+        offset = 0
+        for record in incremental:
+            vectors = added_vectors[offset:offset + len(record["added"])]
+            offset += len(record["added"])
+            updates.append({
+                "name": record["name"],
+                "observations": record["observations"],
+                "embedding": mean_embedding(vectors, record["embedding"], record["embeddingCount"]),
+                "embeddingCount": record["embeddingCount"] + len(vectors)
+            })
+        for record, (embedding_vector, embedding_count) in zip(full, full_embeddings):
+            updates.append({
+                "name": record["name"],
+                "observations": record["observations"],
+                "embedding": embedding_vector,
+                "embeddingCount": embedding_count
+            })
+
+        # Skip entities whose observations changed again while embedding;
+        # with write-behind they stay pending and are picked up again
+        update_query = """
+        UNWIND $updates AS update
+        MATCH (e:Entity {name: update.name})
+        WHERE e.observations = update.observations
+        SET e.embedding = update.embedding,
+            e.embeddingCount = update.embeddingCount,
+            e.embeddingStatus = null,
+            e.embeddingAttempts = null,
+            e.embeddingError = null
+        """
+        await self._write(update_query, {"updates": updates})
+
+    async def _refresh_embeddings(self, changed: list[dict]) -> None:
+        """
+        Re-embeds entities whose observations changed, or with
+        EMBEDDING_WRITE_BEHIND leaves them to the embedding worker, as the
+        write already marked them pending.
+        """
+        if settings.EMBEDDING_WRITE_BEHIND:
+            if changed:
+                self._notify_embedding_worker()
+            return
+        await self._update_embeddings(changed)
+
+    @staticmethod
+    def _notify_embedding_worker() -> None:
+        from app.embedding_worker import embedding_worker
+
+        embedding_worker.notify()
+
+    async def pending_embeddings(self, limit: int, exclude: list[str] | None = None) -> list[dict]:
+        """
+        Returns up to limit entities waiting for an embedding, skipping the
+        names in exclude. Entities that failed fewer times come first, so a
+        text the backend rejects does not hold up the ones queued behind it.
+        """
+        pending_query = """
+        MATCH (e:Entity)
+        WHERE e.embeddingStatus = 'pending' AND NOT e.name IN $exclude
+        RETURN e.name AS name, e.observations AS observations
+        ORDER BY coalesce(e.embeddingAttempts, 0)
+        LIMIT $limit
+        """
+        return await self._read(pending_query, {"limit": limit, "exclude": exclude or []})
+
+    async def record_embedding_failures(self, names: list[str], error: str, max_attempts: int) -> list[str]:
+        """
+        Counts a failed embedding attempt on pending entities, marking those
+        that reached max_attempts embeddingStatus 'failed' so the embedding
+        worker stops claiming them. Returns the names marked failed.
+        """
+        failure_query = """
+        MATCH (e:Entity)
+        WHERE e.name IN $names AND e.embeddingStatus = 'pending'
+        WITH e, coalesce(e.embeddingAttempts, 0) + 1 AS attempts
+        SET e.embeddingAttempts = attempts,
+            e.embeddingError = $error,
+            e.embeddingStatus = CASE WHEN attempts >= $maxAttempts THEN 'failed' ELSE 'pending' END
+        RETURN e.name AS name, e.embeddingStatus = 'failed' AS failed
+        """
+        records = await self._write(failure_query, {"names": names, "error": error, "maxAttempts": max_attempts})
+        return [record["name"] for record in records if record["failed"]]
+
+    async def embed_pending(self, records: list[dict]) -> None:
+        """Embeds pending entities from their whole observation list and clears their status."""
+        await self._update_embeddings([
+            {**record, "added": record["observations"] or [], "embedding": None, "embeddingCount": None}
+            for record in records
+        ])
 
     async def add_observations(self, observations_data: list[dict]) -> list[dict]:
-        """Adds new observations to existing entities in the Neo4j database."""
-        from app.embedding_client import get_embedding
+        """
+        Adds new observations to existing entities in the Neo4j database.
 
-        updated_entities = []
-        async with self.driver.session() as session:
-            tx = await session.begin_transaction()
-            try:
-                for obs_item in observations_data:
-                    entity_name = obs_item["entityName"]
-                    new_contents = obs_item["contents"]
-                    
-                    # Fetch the existing entity and its observations
-                    fetch_query = """
-                    MATCH (e:Entity {name: $entityName})
-                    RETURN e
-                    """
-                    result = await tx.run(fetch_query, {"entityName": entity_name})
-                    record = await result.single()
-
-                    if not record:
-                        print(f"Warning: Entity '{entity_name}' not found. Skipping observation.")
-                        continue
-
-                    entity = record["e"]
-                    existing_observations = entity.get("observations", [])
-                    
-                    # Combine existing and new observations
-                    combined_observations = list(set(existing_observations + new_contents)) # Use set to avoid duplicates
-                    
-                    # Create text for new embedding
-                    text_to_embed = '\n'.join(combined_observations)
-                    embedding_vector = await get_embedding(text_to_embed)
-
-                    # Update the entity
-                    update_query = """
-                    MATCH (e:Entity {name: $entityName})
-                    SET e.observations = $combinedObservations,
-                        e.embedding = $embeddingVector,
-                        e.updatedAt = timestamp()
-                    RETURN e.name AS name, e.observations AS observations
-                    """
-                    update_result = await tx.run(update_query, {
-                        "entityName": entity_name,
-                        "combinedObservations": combined_observations,
-                        "embeddingVector": embedding_vector
-                    })
-                    updated_record = await update_result.single()
-                    if updated_record:
-                        updated_entities.append({
-                            "name": updated_record["name"],
-                            "observations": updated_record["observations"]
-                        })
-                
-                await tx.commit()
-            except Exception as e:
-                await tx.rollback()
-                raise e
-        
-        return updated_entities
+        Observations are merged in a single UNWIND query that keeps insertion
+        order and skips duplicates. Only entities that gained observations, or
+        whose embedding is still pending, are re-embedded, concurrently and
+        outside the write transaction, or with EMBEDDING_WRITE_BEHIND left to
+        the embedding worker.
+        """
+        # Combine items that target the same entity, keeping first occurrences
+        contents_by_entity: dict[str, list[str]] = {}
+        for obs_item in observations_data:
+            contents = contents_by_entity.setdefault(obs_item["entityName"], [])
+            contents.extend(obs for obs in obs_item["contents"] if obs not in contents)
+
+        if not contents_by_entity:
+            return []
+
+        # Entities that gained observations are marked pending in the same
+        # write and cleared once re-embedded, so an embedding failure leaves
+        # them pending and the next call re-embeds them in full. Setting
+        # _lock takes the node's write lock before its observations are read,
+        # so concurrent merges into one entity cannot lose each other's updates.
+        merge_query = """
+        UNWIND $items AS item
+        MATCH (e:Entity {name: item.entityName})
+        SET e._lock = true
+        REMOVE e._lock
+        WITH e, coalesce(e.observations, []) AS existing, item.contents AS contents,
+             coalesce(e.embeddingStatus = 'pending', false) AS pending
+        WITH e, existing, pending, reduce(merged = existing, obs IN contents |
+            CASE WHEN obs IN merged THEN merged ELSE merged + obs END) AS merged
+        SET e.observations = merged,
+            e.updatedAt = CASE WHEN size(merged) > size(existing) THEN timestamp() ELSE e.updatedAt END,
+            e.embeddingStatus = CASE WHEN size(merged) > size(existing) THEN 'pending' ELSE e.embeddingStatus END
+        RETURN e.name AS name,
+               merged AS observations,
+               [obs IN merged WHERE NOT obs IN existing] AS added,
+               pending,
+               CASE WHEN $observationEmbeddings AND NOT pending THEN e.embedding END AS embedding,
+               e.embeddingCount AS embeddingCount
+        """
+
+        items = [{"entityName": name, "contents": contents} for name, contents in contents_by_entity.items()]
+        records = await self._write(merge_query, {
+            "items": items,
+            "observationEmbeddings": settings.OBSERVATION_EMBEDDINGS
+        })
+
+        found = {record["name"] for record in records}
+        for name in contents_by_entity:
+            if name not in found:
+                print(f"Warning: Entity '{name}' not found. Skipping observation.")
+
+        await self._refresh_embeddings([record for record in records if record["added"] or record["pending"]])
+
+        return [{"name": record["name"], "observations": record["observations"]} for record in records]
+
+    @staticmethod
+    def _graph_page_query(
+        cursor: str | None, limit: int | None, fields: list[str] | None, include_embeddings: bool = False
+    ) -> tuple[str, dict]:
+        """Builds the entity query for one page of the graph, keyset-paginated on name."""
+        projection = ", ".join(f".{field}" for field in normalize_entity_fields(fields))
+        if include_embeddings:
+            projection += ", .embedding, .embeddingCount"
+        # Filtering on name in both branches lets the name index back the ORDER BY
+        where = "e.name > $cursor" if cursor is not None else "e.name IS NOT NULL"
+        query = f"""
+        MATCH (e:Entity)
+        WHERE {where}
+        RETURN e {{{projection}}} AS entity
+        ORDER BY e.name
+        """
+        params = {"cursor": cursor}
+        if limit is not None:
+            query += "LIMIT $limit\n"
+            params["limit"] = int(limit)
+        return query, params
+
+    @staticmethod
+    def _graph_relation_query(paginated: bool) -> str:
+        """
+        Builds the relation query for read_graph. A page only carries the
+        relations leaving its entities, so each relation is returned exactly
+        once across all pages.
+        """
+        return f"""
+        MATCH (from:Entity)-[r:RELATES_TO]->(to:Entity)
+        {"WHERE from.name IN $names" if paginated else ""}
+        RETURN from.name AS fromName, to.name AS toName, r.relationType AS relationType, r.strength AS strength, r.confidence AS confidence
+        """
 
-    async def read_graph(self) -> dict:
-        """Reads the entire knowledge graph from Neo4j."""
+    async def read_graph(
+        self,
+        cursor: str | None = None,
+        limit: int | None = None,
+        fields: list[str] | None = None,
+        include_relations: bool = True,
+    ) -> dict:
+        """
+        Reads the knowledge graph from Neo4j.
+
+        Without a limit the whole graph is returned. With a limit, entities are
+        returned in name order starting after cursor, together with the
+        relations leaving them, and nextCursor is set while more pages remain.
+        fields projects entity properties (e.g. to skip observations).
+        """
         import time
         start_time = time.time()
         
-        # Load all entities
-        entity_query = """
-        MATCH (e:Entity)
-        RETURN e.name AS name, e.entityType AS entityType, e.observations AS observations
-        """
+        entity_query, entity_params = self._graph_page_query(cursor, limit, fields)
         
-        async with self.driver.session() as session:
-            entity_result = await session.run(entity_query)
-            entity_records = await entity_result.data()
-            
-            entities = []
-            for record in entity_records:
-                entities.append({
-                    "name": record["name"],
-                    "entityType": record["entityType"],
-                    "observations": record.get("observations", [])
-                })
-            
-            # Load all relations
-            relation_query = """
-            MATCH (from:Entity)-[r:RELATES_TO]->(to:Entity)
-            RETURN from.name AS fromName, to.name AS toName, r.relationType AS relationType, r.strength AS strength, r.confidence AS confidence
-            """
-            
-            relation_result = await session.run(relation_query)
-            relation_records = await relation_result.data()
+        # Both queries run in one read transaction, so relations match the page
+        async def read_page(tx):
+            entity_result = await tx.run(entity_query, entity_params)
+            entities = [record["entity"] async for record in entity_result]
             
             relations = []
-            for record in relation_records:
-                relations.append({
-                    "from": record["fromName"],
-                    "to": record["toName"],
-                    "relationType": record.get("relationType"),
-                    "strength": record.get("strength"),
-                    "confidence": record.get("confidence")
-                })
+            if include_relations:
+                relation_query = self._graph_relation_query(paginated=cursor is not None or limit is not None)
+                relation_result = await tx.run(relation_query, {"names": [entity["name"] for entity in entities]})
+                async for record in relation_result:
+                    relations.append(self._relation_from_record(record))
+            return entities, relations
+        
+        entities, relations = await self._read_transaction(read_page)
         
         time_taken = (time.time() - start_time) * 1000  # Convert to milliseconds
         
+        next_cursor = None
+        if limit is not None and entities and len(entities) == limit:
+            next_cursor = entities[-1]["name"]
+        
         return {
             "entities": entities,
             "relations": relations,
             "total": len(entities),
+            "nextCursor": next_cursor,
             "timeTaken": time_taken
         }
 
+    async def stream_graph(
+        self,
+        cursor: str | None = None,
+        limit: int | None = None,
+        fields: list[str] | None = None,
+        include_relations: bool = True,
+        include_embeddings: bool = False,
+    ):
+        """
+        Streams the knowledge graph record by record as the Bolt cursor yields
+        them, so memory stays flat regardless of graph size. Yields dicts with a
+        "type" of "entity" or "relation", then a final "end" record carrying
+        nextCursor when a limit was given. include_embeddings adds each
+        entity's stored embedding and embeddingCount, for export.
+        """
+        entity_query, entity_params = self._graph_page_query(cursor, limit, fields, include_embeddings)
+        paginated = cursor is not None or limit is not None
+        
+        # Auto-commit, so records stream as they arrive instead of being
+        # buffered by a retryable transaction function. Not timed as a Cypher
+        # stage: the session stays open while the client reads.
+        async with self.driver.session(**self._session_config(default_access_mode=READ_ACCESS)) as session:
+            names = []
+            last_name = None
+            entity_result = await session.run(entity_query, entity_params)
+            async for record in entity_result:
+                entity = record["entity"]
+                last_name = entity["name"]
+                if paginated:
+                    names.append(last_name)
+                yield {"type": "entity", **entity}
+            
+            if include_relations:
+                relation_result = await session.run(self._graph_relation_query(paginated), {"names": names})
+                async for record in relation_result:
+                    yield {"type": "relation", **self._relation_from_record(record)}
+        
+        end = {"type": "end"}
+        if limit is not None:
+            end["nextCursor"] = last_name if len(names) == limit and last_name is not None else None
+        yield end
+
+    @staticmethod
+    def _relation_from_record(record) -> dict:
+        return {
+            "from": record["fromName"],
+            "to": record["toName"],
+            "relationType": record.get("relationType"),
+            "strength": record.get("strength"),
+            "confidence": record.get("confidence")
+        }
+
+    async def vector_index_dimensions(self) -> int | None:
+        """Returns the vector.dimensions of the entity_embeddings index, or None if it does not exist."""
+        existing = await self.execute_query(
+            "SHOW INDEXES YIELD name, options WHERE name = 'entity_embeddings' RETURN options"
+        )
+        if not existing:
+            return None
+        return ((existing[0]["options"] or {}).get("indexConfig") or {}).get("vector.dimensions")
+
+    async def import_entities(self, entities: list[dict], reembed: bool = False) -> dict:
+        """
+        Upserts entities by name for a bulk import, IMPORT_BATCH_SIZE rows per
+        inner transaction of CALL { ... } IN TRANSACTIONS.
+
+        Entities carrying an "embedding" keep it unless reembed is set; only
+        the others are embedded, or with EMBEDDING_WRITE_BEHIND marked pending.
+        Supplied vectors must match the entity_embeddings index, or the
+        embedding model when there is no index yet, so restoring an export
+        with embeddings does not need the embedding backend. Existing
+        entities get the imported type, observations and embedding, keeping
+        their id and createdAt.
+        """
+        from app.embedding_client import get_embedding_dimensions
+
+        import uuid
+
+        batch_size = max(1, int(settings.IMPORT_BATCH_SIZE))
+        # CALL { ... } IN TRANSACTIONS only runs in auto-commit transactions (session.run),
+        # so unlike the other writes the import is not retried on transient errors.
+        # Re-running an import is safe: entities are merged on name.
+        import_query = f"""
+        UNWIND $entities AS row
+        CALL {{
+            WITH row
+            MERGE (e:Entity {{name: row.name}})
+            ON CREATE SET e.id = row.id,
+                e.version = 1,
+                e.createdAt = timestamp(),
+                e.validFrom = timestamp(),
+                e.validTo = null,
+                e.changedBy = null
+            SET e.entityType = row.entityType,
+                e.observations = row.observations,
+                e.embedding = row.embedding,
+                e.embeddingCount = row.embeddingCount,
+                e.embeddingStatus = row.embeddingStatus,
+                e.updatedAt = timestamp()
+        }} IN TRANSACTIONS OF {batch_size} ROWS
+        """
+
+        rows = []
+        to_embed = []
+        for entity in entities:
+            row = {
+                "id": str(uuid.uuid4()),
+                "name": entity["name"],
+                "entityType": entity["entityType"],
+                "observations": entity.get("observations") or [],
+                "embedding": None if reembed else entity.get("embedding"),
+                "embeddingCount": None if reembed else entity.get("embeddingCount"),
+                "embeddingStatus": None,
+            }
+            rows.append(row)
+            if row["embedding"] is None:
+                to_embed.append(row)
+
+        supplied = [row for row in rows if row["embedding"] is not None]
+        if supplied:
+            dimensions = await self.vector_index_dimensions() or await get_embedding_dimensions()
+            for row in supplied:
+                if len(row["embedding"]) != dimensions:
+                    raise ValueError(
+                        f"Entity '{row['name']}' has a {len(row['embedding'])}-dimensional embedding, expected {dimensions}"
+                    )
+
+        write_behind = settings.EMBEDDING_WRITE_BEHIND
+        if to_embed and write_behind:
+            for row in to_embed:
+                row["embeddingStatus"] = "pending"
+        elif to_embed:
+            embeddings = await self._embed_observation_lists([row["observations"] for row in to_embed])
+            for row, (embedding_vector, embedding_count) in zip(to_embed, embeddings):
+                row["embedding"] = embedding_vector
+                row["embeddingCount"] = embedding_count
+
+        async with self._session() as session:
+            result = await session.run(import_query, {"entities": rows})
+            summary = await result.consume()
+
+        if to_embed and write_behind:
+            self._notify_embedding_worker()
+            return {"entities": len(rows), "created": summary.counters.nodes_created, "embedded": 0, "pending": len(to_embed)}
+        return {"entities": len(rows), "created": summary.counters.nodes_created, "embedded": len(to_embed), "pending": 0}
+
+    async def import_relations(self, relations: list[dict]) -> dict:
+        """
+        Upserts relations for a bulk import, IMPORT_BATCH_SIZE rows per inner
+        transaction. A relation is merged on its endpoints and relationType, so
+        re-importing a file does not duplicate it. Relations whose endpoints do
+        not exist are skipped.
+        """
+        import uuid
+
+        batch_size = max(1, int(settings.IMPORT_BATCH_SIZE))
+        import_query = f"""
+        UNWIND $relations AS row
+        CALL {{
+            WITH row
+            MATCH (from:Entity {{name: row.fromName}})
+            MATCH (to:Entity {{name: row.toName}})
+            MERGE (from)-[r:RELATES_TO {{relationType: row.relationType}}]->(to)
+            ON CREATE SET r.id = row.id,
+                r.version = 1,
+                r.createdAt = timestamp(),
+                r.validFrom = timestamp(),
+                r.validTo = null,
+                r.changedBy = null
+            SET r.strength = row.strength,
+                r.confidence = row.confidence,
+                r.metadata = row.metadata,
+                r.updatedAt = timestamp()
+        }} IN TRANSACTIONS OF {batch_size} ROWS
+        """
+
+        rows = [
+            {
+                "id": str(uuid.uuid4()),
+                "fromName": relation["from"],
+                "toName": relation["to"],
+                "relationType": relation["relationType"],
+                "strength": relation.get("strength"),
+                "confidence": relation.get("confidence"),
+                "metadata": str(relation.get("metadata")) if relation.get("metadata") else None,
+            }
+            for relation in relations
+        ]
+
+        async with self._session() as session:
+            result = await session.run(import_query, {"relations": rows})
+            summary = await result.consume()
+
+        return {"relations": len(rows), "created": summary.counters.relationships_created}
+
     async def open_nodes(self, names: list[str]) -> dict:
         """Opens specific nodes by their names and returns them with their relations."""
         import time
@@ -307,44 +1111,45 @@ class Neo4jClient:
         if not names:
             return {"entities": [], "relations": []}
         
-        async with self.driver.session() as session:
-            # Query for entities by name
-            entity_query = """
-            MATCH (e:Entity)
-            WHERE e.name IN $names
-            RETURN e.name AS name, e.entityType AS entityType, e.observations AS observations
-            """
-            
-            entity_result = await session.run(entity_query, {"names": names})
+        # Query for entities by name
+        entity_query = """
+        MATCH (e:Entity)
+        WHERE e.name IN $names
+        RETURN e.name AS name, e.entityType AS entityType, e.observations AS observations
+        """
+        
+        # Get relations between the specified entities
+        relations_query = """
+        MATCH (from:Entity)-[r:RELATES_TO]->(to:Entity)
+        WHERE from.name IN $names AND to.name IN $names
+        RETURN from.name AS fromName, to.name AS toName, r.relationType AS relationType, r.strength AS strength, r.confidence AS confidence
+        """
+        
+        async def read_nodes(tx):
+            entity_result = await tx.run(entity_query, {"names": names})
             entity_records = await entity_result.data()
-            
-            entities = []
-            for record in entity_records:
-                entities.append({
-                    "name": record["name"],
-                    "entityType": record["entityType"],
-                    "observations": record.get("observations", [])
-                })
-            
-            # Get relations between the specified entities
-            relations_query = """
-            MATCH (from:Entity)-[r:RELATES_TO]->(to:Entity)
-            WHERE from.name IN $names AND to.name IN $names
-            RETURN from.name AS fromName, to.name AS toName, r.relationType AS relationType, r.strength AS strength, r.confidence AS confidence
-            """
-            
-            relations_result = await session.run(relations_query, {"names": names})
-            relations_records = await relations_result.data()
-            
-            relations = []
-            for record in relations_records:
-                relations.append({
-                    "from": record["fromName"],
-                    "to": record["toName"],
-                    "relationType": record.get("relationType"),
-                    "strength": record.get("strength"),
-                    "confidence": record.get("confidence")
-                })
+            relations_result = await tx.run(relations_query, {"names": names})
+            return entity_records, await relations_result.data()
+        
+        entity_records, relations_records = await self._read_transaction(read_nodes)
+        
+        entities = []
+        for record in entity_records:
+            entities.append({
+                "name": record["name"],
+                "entityType": record["entityType"],
+                "observations": record.get("observations", [])
+            })
+        
+        relations = []
+        for record in relations_records:
+            relations.append({
+                "from": record["fromName"],
+                "to": record["toName"],
+                "relationType": record.get("relationType"),
+                "strength": record.get("strength"),
+                "confidence": record.get("confidence")
+            })
         
         time_taken = (time.time() - start_time) * 1000  # Convert to milliseconds
         
@@ -364,18 +1169,16 @@ class Neo4jClient:
         if not entity_names:
             return {"deleted": 0, "message": "No entities specified"}
         
-        async with self.driver.session() as session:
-            # Delete entities and their relationships
-            delete_query = """
-            MATCH (e:Entity)
-            WHERE e.name IN $names
-            DETACH DELETE e
-            RETURN count(e) as deleted_count
-            """
-            
-            result = await session.run(delete_query, {"names": entity_names})
-            record = await result.single()
-            deleted_count = record["deleted_count"] if record else 0
+        # Delete entities and their relationships
+        delete_query = """
+        MATCH (e:Entity)
+        WHERE e.name IN $names
+        DETACH DELETE e
+        RETURN count(e) as deleted_count
+        """
+        
+        records = await self._write(delete_query, {"names": entity_names})
+        deleted_count = records[0]["deleted_count"] if records else 0
         
         time_taken = (time.time() - start_time) * 1000
         
@@ -385,94 +1188,184 @@ class Neo4jClient:
             "timeTaken": time_taken
         }
     
-    async def delete_relations(self, relations: list[dict]) -> dict:
-        """Delete specific relationships between entities."""
+    async def delete_entities_in_batches(self, entity_names: list[str], on_progress=None) -> dict:
+        """
+        Delete entities and their relationships in many small transactions.
+
+        Relationships are removed first, DELETE_BATCH_SIZE rows per transaction
+        via CALL { ... } IN TRANSACTIONS, so hub entities with tens of thousands
+        of edges never build one huge transaction. Entities are processed
+        DELETE_ENTITY_CHUNK_SIZE names at a time and on_progress, if given, is
+        called with keyword counters after each chunk.
+        """
         import time
         start_time = time.time()
         
-        if not relations:
-            return {"deleted": 0, "message": "No relations specified"}
+        batch_size = max(1, int(settings.DELETE_BATCH_SIZE))
+        chunk_size = max(1, settings.DELETE_ENTITY_CHUNK_SIZE)
+        
+        # CALL { ... } IN TRANSACTIONS only runs in auto-commit transactions (session.run),
+        # so unlike the other writes these are not retried on transient errors
+        delete_relationships_query = f"""
+        MATCH (e:Entity)
+        WHERE e.name IN $names
+        MATCH (e)-[r]-()
+        WITH DISTINCT r
+        CALL {{ WITH r DELETE r }} IN TRANSACTIONS OF {batch_size} ROWS
+        """
+        delete_entities_query = f"""
+        MATCH (e:Entity)
+        WHERE e.name IN $names
+        CALL {{ WITH e DETACH DELETE e }} IN TRANSACTIONS OF {batch_size} ROWS
+        """
         
-        deleted_count = 0
-        async with self.driver.session() as session:
-            for rel in relations:
-                from_name = rel.get("from")
-                to_name = rel.get("to")
-                rel_type = rel.get("relationType")
+        deleted_entities = 0
+        deleted_relationships = 0
+        processed = 0
+        async with self._session() as session:
+            for i in range(0, len(entity_names), chunk_size):
+                names = entity_names[i:i + chunk_size]
                 
-                if not from_name or not to_name:
-                    continue
+                result = await session.run(delete_relationships_query, {"names": names})
+                summary = await result.consume()
+                deleted_relationships += summary.counters.relationships_deleted
                 
-                # Build query based on whether relationType is specified
-                if rel_type:
-                    delete_query = """
-                    MATCH (from:Entity {name: $from_name})-[r:RELATES_TO]->(to:Entity {name: $to_name})
-                    WHERE r.relationType = $rel_type
-                    DELETE r
-                    RETURN count(r) as deleted_count
-                    """
-                    result = await session.run(delete_query, {
-                        "from_name": from_name,
-                        "to_name": to_name,
-                        "rel_type": rel_type
-                    })
-                else:
-                    delete_query = """
-                    MATCH (from:Entity {name: $from_name})-[r:RELATES_TO]->(to:Entity {name: $to_name})
-                    DELETE r
-                    RETURN count(r) as deleted_count
-                    """
-                    result = await session.run(delete_query, {
-                        "from_name": from_name,
-                        "to_name": to_name
-                    })
+                result = await session.run(delete_entities_query, {"names": names})
+                summary = await result.consume()
+                deleted_entities += summary.counters.nodes_deleted
                 
-                record = await result.single()
-                deleted_count += record["deleted_count"] if record else 0
+                processed += len(names)
+                if on_progress:
+                    on_progress(
+                        processed=processed,
+                        total=len(entity_names),
+                        deletedEntities=deleted_entities,
+                        deletedRelationships=deleted_relationships
+                    )
         
         time_taken = (time.time() - start_time) * 1000
         
         return {
-            "deleted": deleted_count,
-            "relations": relations,
+            "deleted": deleted_entities,
+            "deletedRelationships": deleted_relationships,
+            "entities": entity_names,
+            "timeTaken": time_taken
+        }
+    
+    async def delete_relations(self, relations: list[dict]) -> dict:
+        """
+        Delete specific relationships between entities in a single UNWIND
+        query, reporting how many relationships each item removed.
+        """
+        import time
+        start_time = time.time()
+        
+        if not relations:
+            return {"deleted": 0, "message": "No relations specified"}
+        
+        # A missing relationType matches relations of any type
+        delete_query = """
+        UNWIND $relations AS rel
+        OPTIONAL MATCH (from:Entity {name: rel.fromName})-[r:RELATES_TO]->(to:Entity {name: rel.toName})
+        WHERE rel.relationType IS NULL OR r.relationType = rel.relationType
+        WITH rel, collect(r) AS matched
+        FOREACH (r IN matched | DELETE r)
+        RETURN rel.index AS index, size(matched) AS deleted_count
+        """
+        
+        params = [
+            {
+                "index": index,
+                "fromName": rel.get("from"),
+                "toName": rel.get("to"),
+                "relationType": rel.get("relationType")
+            }
+            for index, rel in enumerate(relations)
+            if rel.get("from") and rel.get("to")
+        ]
+        
+        counts = {}
+        if params:
+            for record in await self._write(delete_query, {"relations": params}):
+                counts[record["index"]] = counts.get(record["index"], 0) + record["deleted_count"]
+        
+        outcomes = [{**rel, "deleted": counts.get(index, 0)} for index, rel in enumerate(relations)]
+        time_taken = (time.time() - start_time) * 1000
+        
+        return {
+            "deleted": sum(counts.values()),
+            "relations": outcomes,
             "timeTaken": time_taken
         }
     
     async def delete_observations(self, deletions: list[dict]) -> dict:
-        """Delete specific observations from entities."""
+        """
+        Delete specific observations from entities in a single UNWIND query,
+        reporting how many observations were actually removed per entity.
+        Entities that lost observations are re-embedded from the ones they keep.
+        """
         import time
         start_time = time.time()
         
         if not deletions:
             return {"deleted": 0, "message": "No deletions specified"}
         
-        deleted_count = 0
-        async with self.driver.session() as session:
-            for deletion in deletions:
-                entity_name = deletion.get("entityName")
-                observations_to_remove = deletion.get("observations", [])
-                
-                if not entity_name or not observations_to_remove:
-                    continue
-                
-                # Remove specific observations from the entity
-                delete_query = """
-                MATCH (e:Entity {name: $entity_name})
-                SET e.observations = [obs IN e.observations WHERE NOT obs IN $observations_to_remove]
-                RETURN size($observations_to_remove) as deleted_count
-                """
-                
-                result = await session.run(delete_query, {
-                    "entity_name": entity_name,
-                    "observations_to_remove": observations_to_remove
-                })
-                record = await result.single()
-                deleted_count += record["deleted_count"] if record else 0
+        # Combine deletions that target the same entity, so no row of the
+        # query overwrites another row's update
+        to_remove: dict[str, list[str]] = {}
+        for deletion in deletions:
+            entity_name = deletion.get("entityName")
+            observations_to_remove = deletion.get("observations", [])
+            if not entity_name or not observations_to_remove:
+                continue
+            observations = to_remove.setdefault(entity_name, [])
+            observations.extend(obs for obs in observations_to_remove if obs not in observations)
+        
+        # The stored embedding still covers the removed observations, so
+        # changed entities are marked pending and re-embedded in full. The
+        # write lock is taken before reading, as in add_observations.
+        delete_query = """
+        UNWIND $deletions AS deletion
+        OPTIONAL MATCH (e:Entity {name: deletion.entityName})
+        SET e._lock = true
+        REMOVE e._lock
+        WITH deletion, e, coalesce(e.observations, []) AS before,
+             coalesce(e.embeddingStatus = 'pending', false) AS pending
+        WITH deletion, e, before, pending, [obs IN before WHERE NOT obs IN deletion.observations] AS kept
+        FOREACH (_ IN CASE WHEN e IS NOT NULL AND size(kept) < size(before) THEN [1] ELSE [] END |
+            SET e.observations = kept,
+                e.updatedAt = timestamp(),
+                e.embeddingStatus = 'pending',
+                e.embeddingCount = null
+        )
+        RETURN deletion.entityName AS entity_name, e IS NOT NULL AS found, size(before) - size(kept) AS deleted_count,
+               kept AS observations, pending
+        """
+        
+        outcomes = {
+            name: {"entityName": name, "observations": observations, "found": False, "deleted": 0}
+            for name, observations in to_remove.items()
+        }
+        if outcomes:
+            records = await self._write(delete_query, {
+                "deletions": [{"entityName": name, "observations": observations} for name, observations in to_remove.items()]
+            })
+            for record in records:
+                outcome = outcomes[record["entity_name"]]
+                outcome["found"] = outcome["found"] or record["found"]
+                outcome["deleted"] += record["deleted_count"]
+            
+            await self._refresh_embeddings([
+                {"name": record["entity_name"], "observations": record["observations"], "added": [],
+                 "embedding": None, "embeddingCount": None}
+                for record in records
+                if record["found"] and (record["deleted_count"] or record["pending"])
+            ])
         
         time_taken = (time.time() - start_time) * 1000
         
         return {
-            "deleted": deleted_count,
-            "deletions": deletions,
+            "deleted": sum(outcome["deleted"] for outcome in outcomes.values()),
+            "deletions": list(outcomes.values()),
             "timeTaken": time_taken
         }
@@ -0,0 +1,94 @@
+import json
+import time
+from collections import OrderedDict
+
+from app.config import settings
+from app.serialization import dumps
+
+
+class ResultCache:
+    """
+    A TTL + LRU cache of read-tool results, invalidated by writes and bounded
+    both by entry count and by the serialized size of the cached results.
+
+    Every write bumps the graph generation and drops all entries. A read only
+    stores its result if no write happened while it ran, so a result computed
+    against the old graph can never be cached after the write that changed it.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, max_bytes: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.generation = 0
+        self._entries: OrderedDict[str, tuple[float, object, int]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(tool_name: str, arguments: dict) -> str:
+        """Returns a cache key for a tool call, independent of argument order."""
+        return json.dumps([tool_name, arguments], sort_keys=True, separators=(",", ":"), default=str)
+
+    def get(self, key: str):
+        """Returns the cached result for key, or None if absent or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value, size = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._bytes -= size
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value, generation: int) -> None:
+        """Stores a result computed while the graph was at the given generation."""
+        if generation != self.generation or self.max_entries <= 0:
+            return
+        size = len(dumps(value))
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[2]
+        self._entries[key] = (time.monotonic() + self.ttl, value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._bytes -= evicted
+
+    def invalidate(self) -> None:
+        """Bumps the graph generation and drops every cached result."""
+        self.generation += 1
+        self.invalidations += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "bytes": self._bytes,
+            "maxBytes": self.max_bytes,
+            "generation": self.generation,
+            "invalidations": self.invalidations,
+        }
+
+
+# Create a single, reusable cache instance
+result_cache = ResultCache(
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+    ttl=settings.RESULT_CACHE_TTL,
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+)
@@ -0,0 +1,176 @@
+"""
+Idempotent schema bootstrap for the knowledge graph.
+
+Creates the uniqueness constraint on Entity.name, the entity_embeddings vector
+index, the entity_fulltext index, the RELATES_TO relationType index and the
+Entity.embeddingStatus index, then waits for them to come online.
+Every statement uses IF NOT EXISTS, so running it on each startup is safe.
+If the embedding model cannot be reached yet (e.g. while it is still being
+pulled), the vector index is created by a background retry once it answers.
+"""
+import asyncio
+import sys
+
+from neo4j.exceptions import Neo4jError
+
+from app.config import settings
+from app.neo4j_client import Neo4jClient
+
+VECTOR_INDEX_NAME = "entity_embeddings"
+
+# Back-off of the vector index retry (seconds), doubling up to the maximum
+VECTOR_INDEX_RETRY_DELAY = 5.0
+VECTOR_INDEX_MAX_RETRY_DELAY = 300.0
+
+_vector_index_retry: asyncio.Task | None = None
+
+NAME_CONSTRAINT = """
+CREATE CONSTRAINT entity_name_unique IF NOT EXISTS
+FOR (e:Entity) REQUIRE e.name IS UNIQUE
+"""
+
+# Used instead of the constraint when existing data already has duplicate names
+NAME_INDEX = """
+CREATE INDEX entity_name IF NOT EXISTS
+FOR (e:Entity) ON (e.name)
+"""
+
+RELATION_TYPE_INDEX = """
+CREATE INDEX relates_to_type IF NOT EXISTS
+FOR ()-[r:RELATES_TO]-() ON (r.relationType)
+"""
+
+# Lets the write-behind embedding worker find pending entities without a label scan
+EMBEDDING_STATUS_INDEX = """
+CREATE INDEX entity_embedding_status IF NOT EXISTS
+FOR (e:Entity) ON (e.embeddingStatus)
+"""
+
+# Indexes the observation list where the Neo4j version supports LIST<STRING>
+# full-text properties; older versions skip non-string values and match names only
+FULLTEXT_INDEX = """
+CREATE FULLTEXT INDEX entity_fulltext IF NOT EXISTS
+FOR (e:Entity) ON EACH [e.name, e.observations]
+"""
+
+VECTOR_INDEX = """
+CREATE VECTOR INDEX entity_embeddings IF NOT EXISTS
+FOR (e:Entity) ON e.embedding
+OPTIONS {indexConfig: {
+    `vector.dimensions`: %d,
+    `vector.similarity_function`: 'cosine'
+}}
+"""
+
+
+async def _create_name_lookup(client: Neo4jClient) -> None:
+    """Creates the Entity.name uniqueness constraint, or a plain index if names are duplicated."""
+    try:
+        await client.execute_query(NAME_CONSTRAINT)
+    except Neo4jError as e:
+        print(
+            f"Warning: could not create uniqueness constraint on Entity.name ({e.message}). "
+            "Falling back to a non-unique index; remove duplicate entities and drop the "
+            "'entity_name' index to enable the constraint.",
+            file=sys.stderr,
+        )
+        await client.execute_query(NAME_INDEX)
+
+
+async def _create_vector_index(client: Neo4jClient) -> None:
+    """
+    Creates the vector index sized for the configured embedding model.
+    Raises if the model's dimensions cannot be determined.
+    """
+    from app.embedding_client import get_embedding_dimensions, get_embedding_model
+
+    dimensions = await get_embedding_dimensions()
+
+    existing_dimensions = await client.vector_index_dimensions()
+    if existing_dimensions is not None:
+        if existing_dimensions != dimensions:
+            print(
+                f"Warning: vector index '{VECTOR_INDEX_NAME}' has {existing_dimensions} dimensions "
+                f"but {get_embedding_model()} produces {dimensions}. Drop the index and "
+                "re-embed entities to fix semantic search.",
+                file=sys.stderr,
+            )
+        return
+
+    await client.execute_query(VECTOR_INDEX % int(dimensions))
+
+
+async def _retry_vector_index(client: Neo4jClient) -> None:
+    """Retries creating the vector index with exponential back-off until it succeeds."""
+    global _vector_index_retry
+    delay = VECTOR_INDEX_RETRY_DELAY
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            await _create_vector_index(client)
+        except Exception as e:
+            delay = min(delay * 2, VECTOR_INDEX_MAX_RETRY_DELAY)
+            print(f"Vector index still not created, retrying in {delay:.0f}s: {e}", file=sys.stderr)
+            continue
+        print(f"Vector index '{VECTOR_INDEX_NAME}' created.", file=sys.stderr)
+        _vector_index_retry = None
+        return
+
+
+async def stop_vector_index_retry() -> None:
+    """Cancels a pending vector index retry. Called on application shutdown."""
+    global _vector_index_retry
+    task, _vector_index_retry = _vector_index_retry, None
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+async def schema_status(client: Neo4jClient) -> list[dict]:
+    """Returns the name, type, state and population of every index and constraint."""
+    indexes = await client.execute_query(
+        "SHOW INDEXES YIELD name, type, state, populationPercent, labelsOrTypes, properties "
+        "RETURN name, type, state, populationPercent, labelsOrTypes, properties"
+    )
+    constraints = await client.execute_query(
+        "SHOW CONSTRAINTS YIELD name, type, labelsOrTypes, properties "
+        "RETURN name, type, labelsOrTypes, properties"
+    )
+    return [{"kind": "index", **record} for record in indexes] + \
+        [{"kind": "constraint", **record} for record in constraints]
+
+
+async def ensure_schema(client: Neo4jClient, timeout: int | None = None) -> list[dict]:
+    """
+    Creates any missing constraints and indexes, waits for them to come
+    online and returns their status.
+    """
+    global _vector_index_retry
+    timeout = settings.SCHEMA_AWAIT_TIMEOUT if timeout is None else timeout
+
+    await _create_name_lookup(client)
+    await client.execute_query(RELATION_TYPE_INDEX)
+    await client.execute_query(EMBEDDING_STATUS_INDEX)
+    await client.execute_query(FULLTEXT_INDEX)
+    try:
+        await _create_vector_index(client)
+    except Exception as e:
+        print(
+            f"Warning: could not determine embedding dimensions, creating the vector index "
+            f"in the background once the embedding model answers: {e}",
+            file=sys.stderr,
+        )
+        if _vector_index_retry is None:
+            _vector_index_retry = asyncio.create_task(_retry_vector_index(client))
+
+    try:
+        await client.execute_query("CALL db.awaitIndexes($timeout)", {"timeout": timeout})
+    except Neo4jError as e:
+        print(f"Warning: indexes not online after {timeout}s: {e.message}", file=sys.stderr)
+
+    status = await schema_status(client)
+    for item in status:
+        state = item.get("state")
+        progress = f" {item['populationPercent']:.0f}%" if item.get("populationPercent") is not None else ""
+        print(f"Schema {item['kind']} {item['name']} ({item['type']}){' ' + state if state else ''}{progress}", file=sys.stderr)
+    return status
@@ -0,0 +1,87 @@
+"""
+JSON encoding and response compression for MCP responses.
+
+orjson is used when installed and falls back to the standard library.
+Responses are compressed with zstd (requires the zstandard package) or gzip,
+whichever the client accepts, once they are large enough to be worth it.
+"""
+import gzip
+import json
+
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies larger than this are compressed in a worker thread instead of on the event loop
+COMPRESS_IN_THREAD_BYTES = 256 * 1024
+
+
+def dumps(data) -> bytes:
+    """Serializes data to compact UTF-8 JSON. Values JSON cannot represent are encoded with str()."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def loads(data: bytes | str):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def available_encodings() -> list[str]:
+    """Content codings the server can produce, in order of preference."""
+    return (["zstd"] if zstandard is not None else []) + ["gzip"]
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """Picks the preferred supported coding from an Accept-Encoding header, or None."""
+    if not accept_encoding:
+        return None
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    candidates = [
+        coding for coding in available_encodings()
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0
+    ]
+    if not candidates:
+        return None
+    # Highest quality first; ties keep the server's preference order
+    return max(candidates, key=lambda coding: accepted.get(coding, accepted.get("*", 0.0)))
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.RESPONSE_ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL)
+
+
+def encode_body(body: bytes, accept_encoding: str | None) -> tuple[bytes, str | None]:
+    """
+    Compresses body for a client with the given Accept-Encoding header.
+    Returns the body to send and its Content-Encoding (None if uncompressed).
+    """
+    if not settings.RESPONSE_COMPRESSION or len(body) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+        return body, None
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return body, None
+    return compress(body, encoding), encoding
@@ -0,0 +1,576 @@
+"""
+Registry of the MCP tools exposed by the server.
+
+Each tool is declared once, next to its handler, with its input schema,
+whether it only reads the graph, and an optional timeout. The tools/list
+response is built and serialized once at import time.
+"""
+import os
+from typing import Awaitable, Callable
+
+from app import bulk
+from app.config import settings
+from app.jobs import jobs
+from app.neo4j_client import Neo4jClient
+from app.result_cache import result_cache
+from app.serialization import dumps
+
+Handler = Callable[[Neo4jClient, dict], Awaitable[dict]]
+
+
+class Tool:
+    """An MCP tool: its schema, its handler and how the server should run it."""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        input_schema: dict,
+        handler: Handler,
+        error_message: str,
+        read_only: bool = False,
+        cacheable: bool | Callable[[dict], bool] = False,
+        timeout: float | None = None,
+    ):
+        self.name = name
+        self.description = description
+        self.input_schema = input_schema
+        self.handler = handler
+        # Prefix of the JSON-RPC error message when the handler raises
+        self.error_message = error_message
+        # Read-only tools may run concurrently and never invalidate the result cache
+        self.read_only = read_only
+        # True, or a predicate on the arguments for tools cached only for some calls
+        self.cacheable = cacheable
+        # Seconds before the call is abandoned; None uses the read/write default
+        self.timeout = timeout
+
+    def caches(self, tool_args: dict) -> bool:
+        """Whether the result of a call with these arguments goes through the result cache."""
+        return self.cacheable(tool_args) if callable(self.cacheable) else self.cacheable
+
+    def to_dict(self) -> dict:
+        """Returns the tool's tools/list entry."""
+        return {"name": self.name, "description": self.description, "inputSchema": self.input_schema}
+
+
+# Tools in the order they are listed to clients
+TOOLS: dict[str, Tool] = {}
+
+
+def tool(name: str, description: str, input_schema: dict, error_message: str, **options):
+    """Registers the decorated coroutine as the handler of an MCP tool."""
+    def register(handler: Handler) -> Handler:
+        TOOLS[name] = Tool(name, description, input_schema, handler, error_message, **options)
+        return handler
+    return register
+
+
+def text_result(text: str) -> dict:
+    return {"content": [{"type": "text", "text": text}]}
+
+
+def json_result(data) -> dict:
+    return {"content": [{"type": "json", "json": data}]}
+
+
+@tool(
+    "create_entities",
+    "Create multiple new entities in the knowledge graph.",
+    {
+        "type": "object",
+        "properties": {
+            "entities": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "entityType": {"type": "string"},
+                        "observations": {"type": "array", "items": {"type": "string"}}
+                    },
+                    "required": ["name", "entityType"]
+                }
+            },
+            "upsert": {
+                "type": "boolean",
+                "description": "Update entities that already exist instead of creating duplicates: their observations are merged and only changed entities are re-embedded. Defaults to the server's CREATE_ENTITIES_UPSERT setting."
+            },
+            "matchEntityType": {
+                "type": "boolean",
+                "description": "Upsert only: skip entities whose name exists with a different entityType instead of changing its type",
+                "default": False
+            }
+        },
+        "required": ["entities"]
+    },
+    error_message="Error creating entities",
+)
+async def create_entities(neo4j_client: Neo4jClient, tool_args: dict) -> dict:
+    entities_to_create = tool_args.get("entities", [])
+    if not entities_to_create:
+        raise ValueError("The 'entities' array cannot be empty.")
+
+    if tool_args.get("upsert", settings.CREATE_ENTITIES_UPSERT):
+        result = await neo4j_client.upsert_entities(
+            entities_to_create, match_entity_type=tool_args.get("matchEntityType", False)
+        )
+        message = (
+            f"Created {len(result['created'])} entities, updated {len(result['updated'])}, "
+            f"{len(result['unchanged'])} unchanged."
+        )
+        if result["skipped"]:
+            message += f" Skipped {len(result['skipped'])} whose name exists with another entityType: {', '.join(result['skipped'])}"
+        return text_result(message)
+
+    created_data = await neo4j_client.create_entities(entities_to_create)
+    return text_result(f"Successfully created {len(created_data)} entities.")
+
+
+@tool(
+    "semantic_search",
+    "Perform a semantic search for entities in the knowledge graph.",
+    {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "description": "The natural language query for semantic search."},
+            "limit": {"type": "integer", "description": "Maximum number of results to return.", "default": 5},
+            "search_mode": {
+                "type": "string",
+                "enum": ["vector", "fulltext", "hybrid"],
+                "description": "'vector' ranks by meaning, 'fulltext' by keywords and names, 'hybrid' fuses both (best for exact names and keywords).",
+                "default": "vector"
+            },
+            "candidates": {"type": "integer", "description": "Hybrid mode: candidates taken from each index before fusion."},
+            "vector_weight": {"type": "number", "description": "Hybrid mode: weight of the vector ranking in the fusion."},
+            "text_weight": {"type": "number", "description": "Hybrid mode: weight of the full-text ranking in the fusion."},
+            "expand_hops": {"type": "integer", "description": "Also return each hit's neighbors within this many relation hops (1-3), with the connecting relations.", "default": 0},
+            "max_neighbors": {"type": "integer", "description": "Maximum neighbors returned per hit when expanding, strongest first.", "default": 10},
+            "include_pending": {"type": "boolean", "description": "Vector mode: also match entities whose embedding is still being computed, by keywords.", "default": False}
+        },
+        "required": ["query"]
+    },
+    error_message="Error performing semantic search",
+    read_only=True,
+    cacheable=True,
+)
+async def semantic_search(neo4j_client: Neo4jClient, tool_args: dict) -> dict:
+    query = tool_args.get("query")
+    limit = tool_args.get("limit", 5)
+    if not query:
+        raise ValueError("The 'query' argument cannot be empty.")
+
+    search_results = await neo4j_client.semantic_search(
+        query,
+        limit,
+        search_mode=tool_args.get("search_mode", "vector"),
+        candidates=tool_args.get("candidates"),
+        vector_weight=tool_args.get("vector_weight"),
+        text_weight=tool_args.get("text_weight"),
+        expand_hops=tool_args.get("expand_hops", 0),
+        max_neighbors=tool_args.get("max_neighbors", 10),
+        include_pending=tool_args.get("include_pending", False)
+    )
+
+    # Format results for MCP response
+    formatted_results = []
+    for record in search_results:
+        formatted = {
+            "name": record.get("name"),
+            "entityType": record.get("entityType"),
+            "score": record.get("score"),
+            "observations": record.get("observations")
+        }
+        if "neighbors" in record:
+            formatted["neighbors"] = record["neighbors"]
+            formatted["relations"] = record["relations"]
+        formatted_results.append(formatted)
+    return json_result(formatted_results)
+
+
+@tool(
+    "create_relations",
+    "Create multiple new relations between entities in the knowledge graph. Relations should be in active voice.",
+    {
+        "type": "object",
+        "properties": {
+            "relations": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "from": {"type": "string", "description": "The name of the entity where the relation starts"},
+                        "to": {"type": "string", "description": "The name of the entity where the relation ends"},
+                        "relationType": {"type": "string", "description": "The type of the relation"},
+                        "strength": {"type": "number", "description": "Optional strength of relation (0.0 to 1.0)"},
+                        "confidence": {"type": "number", "description": "Optional confidence level in relation accuracy (0.0 to 1.0)"},
+                        "metadata": {"type": "object", "description": "Optional metadata about the relation"}
+                    },
+                    "required": ["from", "to", "relationType"]
+                }
+            }
+        },
+        "required": ["relations"]
+    },
+    error_message="Error creating relations",
+)
+async def create_relations(neo4j_client: Neo4jClient, tool_args: dict) -> dict:
+    relations_to_create = tool_args.get("relations", [])
+    if not relations_to_create:
+        raise ValueError("The 'relations' array cannot be empty.")
+
+    result = await neo4j_client.create_relations_detailed(relations_to_create)
+
+    message = f"Successfully created {len(result['created'])} relations."
+    if result["skipped"]:
+        skipped = ", ".join(f"{rel['from']} -> {rel['to']}" for rel in result["skipped"])
+        message += f" Skipped {len(result['skipped'])} with missing entities: {skipped}"
+    return text_result(message)
+
+
+@tool(
+    "add_observations",
+    "Add new observations to existing entities in the knowledge graph.",
+    {
+        "type": "object",
+        "properties": {
+            "observations": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "entityName": {"type": "string", "description": "The name of the entity to add the observations to"},
+                        "contents": {"type": "array", "items": {"type": "string"}, "description": "An array of observation contents to add"},
+                        "strength": {"type": "number", "description": "Strength value (0.0 to 1.0) for this specific observation"},
+                        "confidence": {"type": "number", "description": "Confidence level (0.0 to 1.0) for this specific observation"},
+                        "metadata": {"type": "object", "description": "Metadata for this specific observation"}
+                    },
+                    "required": ["entityName", "contents"]
+                }
+            },
+            "strength": {"type": "number", "description": "Default strength value (0.0 to 1.0) for all observations"},
+            "confidence": {"type": "number", "description": "Default confidence level (0.0 to 1.0) for all observations"},
+            "metadata": {"type": "object", "description": "Default metadata for all observations"}
+        },
+        "required": ["observations"]
+    },
+    error_message="Error adding observations",
+)
+async def add_observations(neo4j_client: Neo4jClient, tool_args: dict) -> dict:
+    observations_to_add = tool_args.get("observations", [])
+    if not observations_to_add:
+        raise ValueError("The 'observations' array cannot be empty.")
+
+    added_observations = await neo4j_client.add_observations(observations_to_add)
+    return text_result(f"Successfully added {len(added_observations)} observations.")
+
+
+@tool(
+    "read_graph",
+    "Read the knowledge graph. Pass 'limit' to page through large graphs using the returned 'nextCursor'.",
+    {
+        "type": "object",
+        "properties": {
+            "cursor": {"type": "string", "description": "Return entities whose name sorts after this cursor (the previous page's nextCursor)"},
+            "limit": {"type": "integer", "description": "Maximum number of entities per page. Omit to read the whole graph."},
+            "fields": {
+                "type": "array",
+                "items": {"type": "string", "enum": ["name", "entityType", "observations"]},
+                "description": "Entity fields to return, e.g. [\"name\", \"entityType\"] to skip observations"
+            },
+            "includeRelations": {"type": "boolean", "description": "Whether to return relations", "default": True}
+        }
+    },
+    error_message="Error reading graph",
+    read_only=True,
+    # A whole-graph read would pin the entire graph in memory
+    cacheable=lambda tool_args: tool_args.get("limit") is not None,
+)
+async def read_graph(neo4j_client: Neo4jClient, tool_args: dict) -> dict:
+    graph_data = await neo4j_client.read_graph(
+        cursor=tool_args.get("cursor"),
+        limit=tool_args.get("limit"),
+        fields=tool_args.get("fields"),
+        include_relations=tool_args.get("includeRelations", True)
+    )
+    return json_result(graph_data)
+
+
+@tool(
+    "open_nodes",
+    "Open specific nodes in the knowledge graph by their names.",
+    {
+        "type": "object",
+        "properties": {
+            "names": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "An array of entity names to retrieve"
+            }
+        },
+        "required": ["names"]
+    },
+    error_message="Error opening nodes",
+    read_only=True,
+    cacheable=True,
+)
+async def open_nodes(neo4j_client: Neo4jClient, tool_args: dict) -> dict:
+    names = tool_args.get("names", [])
+    if not names:
+        raise ValueError("The 'names' array cannot be empty.")
+
+    nodes_data = await neo4j_client.open_nodes(names)
+    return json_result(nodes_data)
+
+
+@tool(
+    "delete_entities",
+    "⚠️ DELETE entities and all their relationships. REQUIRES USER APPROVAL.",
+    {
+        "type": "object",
+        "properties": {
+            "entityNames": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Names of entities to delete"
+            },
+            "background": {
+                "type": "boolean",
+                "description": "Delete in small batches in the background and return a job ID immediately. Use for large deletions or entities with many relations.",
+                "default": False
+            }
+        },
+        "required": ["entityNames"]
+    },
+    error_message="Error deleting entities",
+)
+async def delete_entities(neo4j_client: Neo4jClient, tool_args: dict) -> dict:
+    entity_names = tool_args.get("entityNames", [])
+    if not entity_names:
+        raise ValueError("The 'entityNames' array cannot be empty.")
+
+    if tool_args.get("background"):
+        async def run(job):
+            def on_progress(**progress):
+                job.update(**progress)
+                # Every finished chunk changes the graph
+                result_cache.invalidate()
+            return await neo4j_client.delete_entities_in_batches(entity_names, on_progress=on_progress)
+
+        job = jobs.start("delete_entities", run)
+        job.update(processed=0, total=len(entity_names))
+        return text_result(f"⚠️ Deleting {len(entity_names)} entities in the background. Job ID: {job.id} (check with get_job_status)")
+
+    result = await neo4j_client.delete_entities(entity_names)
+    return text_result(f"⚠️ Deleted {result['deleted']} entities: {', '.join(entity_names)}")
+
+
+@tool(
+    "get_job_status",
+    "Get the status and progress of a background job, such as a background delete_entities or import_graph call.",
+    {
+        "type": "object",
+        "properties": {
+            "jobId": {"type": "string", "description": "The job ID returned when the job was started"}
+        },
+        "required": ["jobId"]
+    },
+    error_message="Error getting job status",
+    read_only=True,
+)
+async def get_job_status(neo4j_client: Neo4jClient, tool_args: dict) -> dict:
+    job_id = tool_args.get("jobId")
+    if not job_id:
+        raise ValueError("The 'jobId' argument cannot be empty.")
+
+    job = jobs.get(job_id)
+    if job is None:
+        raise ValueError(f"No job with ID '{job_id}'.")
+    return json_result(job.to_dict())
+
+
+@tool(
+    "delete_relations",
+    "⚠️ DELETE specific relationships between entities. REQUIRES USER APPROVAL.",
+    {
+        "type": "object",
+        "properties": {
+            "relations": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "from": {"type": "string"},
+                        "to": {"type": "string"},
+                        "relationType": {"type": "string", "description": "Optional: specific relation type to delete"}
+                    },
+                    "required": ["from", "to"]
+                }
+            }
+        },
+        "required": ["relations"]
+    },
+    error_message="Error deleting relations",
+)
+async def delete_relations(neo4j_client: Neo4jClient, tool_args: dict) -> dict:
+    relations = tool_args.get("relations", [])
+    if not relations:
+        raise ValueError("The 'relations' array cannot be empty.")
+
+    result = await neo4j_client.delete_relations(relations)
+
+    message = f"⚠️ Deleted {result['deleted']} relationships"
+    not_found = [f"{rel.get('from')} -> {rel.get('to')}" for rel in result["relations"] if not rel["deleted"]]
+    if not_found:
+        message += f". Not found: {', '.join(not_found)}"
+    return text_result(message)
+
+
+@tool(
+    "delete_observations",
+    "⚠️ DELETE specific observations from entities. REQUIRES USER APPROVAL.",
+    {
+        "type": "object",
+        "properties": {
+            "deletions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "entityName": {"type": "string"},
+                        "observations": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Specific observations to remove"
+                        }
+                    },
+                    "required": ["entityName", "observations"]
+                }
+            }
+        },
+        "required": ["deletions"]
+    },
+    error_message="Error deleting observations",
+)
+async def delete_observations(neo4j_client: Neo4jClient, tool_args: dict) -> dict:
+    deletions = tool_args.get("deletions", [])
+    if not deletions:
+        raise ValueError("The 'deletions' array cannot be empty.")
+
+    result = await neo4j_client.delete_observations(deletions)
+
+    message = f"⚠️ Deleted {result['deleted']} observations"
+    missing = [deletion["entityName"] for deletion in result["deletions"] if not deletion["found"]]
+    if missing:
+        message += f". Entities not found: {', '.join(missing)}"
+    return text_result(message)
+
+
+@tool(
+    "import_graph",
+    "Bulk import entities and relations from JSONL records, as written by export_graph. Entities are merged on name: an existing entity's entityType, observations and embedding are replaced by the imported ones, not combined. Relations are merged on their endpoints and type.",
+    {
+        "type": "object",
+        "properties": {
+            "path": {"type": "string", "description": "JSONL file to import, relative to the server's bulk directory"},
+            "records": {
+                "type": "array",
+                "items": {"type": "object"},
+                "description": "Records to import instead of a file: {\"type\": \"entity\", \"name\", \"entityType\", \"observations\", \"embedding\"} or {\"type\": \"relation\", \"from\", \"to\", \"relationType\"}"
+            },
+            "reembed": {
+                "type": "boolean",
+                "description": "Recompute embeddings even for entities that carry one",
+                "default": False
+            },
+            "background": {
+                "type": "boolean",
+                "description": "Import in the background and return a job ID immediately. Use for large files.",
+                "default": False
+            }
+        }
+    },
+    error_message="Error importing graph",
+)
+async def import_graph(neo4j_client: Neo4jClient, tool_args: dict) -> dict:
+    path = tool_args.get("path")
+    records = tool_args.get("records")
+    if not path and not records:
+        raise ValueError("Either 'path' or 'records' is required.")
+    source = records
+    if path:
+        target = bulk.resolve_path(path)
+        if not os.path.isfile(target):
+            raise ValueError(f"File '{path}' not found in the bulk directory.")
+        source = bulk.read_records(target)
+    reembed = tool_args.get("reembed", False)
+
+    if tool_args.get("background"):
+        async def run(job):
+            def on_progress(**progress):
+                job.update(**progress)
+                # Every written chunk changes the graph
+                result_cache.invalidate()
+            return await bulk.import_graph(neo4j_client, source, reembed=reembed, on_progress=on_progress)
+
+        job = jobs.start("import_graph", run)
+        return text_result(f"Importing in the background. Job ID: {job.id} (check with get_job_status)")
+
+    result = await bulk.import_graph(neo4j_client, source, reembed=reembed)
+    embedded = f"{result['embedded']} embedded"
+    if result["pending"]:
+        embedded += f", {result['pending']} queued for embedding"
+    return text_result(
+        f"Imported {result['entities']} entities ({result['entitiesCreated']} new, {embedded}) "
+        f"and {result['relations']} relations ({result['relationsCreated']} new)."
+    )
+
+
+@tool(
+    "export_graph",
+    "Export the whole knowledge graph as JSONL records that import_graph can load, to a file on the server or inline.",
+    {
+        "type": "object",
+        "properties": {
+            "path": {"type": "string", "description": "File to write, relative to the server's bulk directory. Omit to return the records inline."},
+            "includeEmbeddings": {
+                "type": "boolean",
+                "description": "Include stored embeddings so an import does not need to recompute them",
+                "default": False
+            },
+            "background": {
+                "type": "boolean",
+                "description": "Export to 'path' in the background and return a job ID immediately",
+                "default": False
+            }
+        }
+    },
+    error_message="Error exporting graph",
+    read_only=True,
+)
+async def export_graph(neo4j_client: Neo4jClient, tool_args: dict) -> dict:
+    path = tool_args.get("path")
+    include_embeddings = tool_args.get("includeEmbeddings", False)
+    if not path:
+        if tool_args.get("background"):
+            raise ValueError("A background export needs a 'path'.")
+        return json_result([record async for record in bulk.export_records(neo4j_client, include_embeddings)])
+
+    target = bulk.resolve_path(path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if tool_args.get("background"):
+        job = jobs.start("export_graph", lambda job: bulk.export_graph(neo4j_client, target, include_embeddings))
+        return text_result(f"Exporting in the background. Job ID: {job.id} (check with get_job_status)")
+
+    result = await bulk.export_graph(neo4j_client, target, include_embeddings)
+    return text_result(f"Exported {result['entities']} entities and {result['relations']} relations to {path}.")
+
+
+# tools/list never changes at runtime, so it is built and serialized once
+TOOLS_LIST_RESULT = {"tools": [registered.to_dict() for registered in TOOLS.values()]}
+TOOLS_LIST_JSON = dumps(TOOLS_LIST_RESULT)
+
+
+def tools_list_response(request_id) -> bytes:
+    """Returns a serialized tools/list response without re-encoding the schemas."""
+    return b'{"jsonrpc":"2.0","result":' + TOOLS_LIST_JSON + b',"id":' + dumps(request_id) + b"}"
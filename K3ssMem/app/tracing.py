@@ -0,0 +1,209 @@
+"""
+Optional OpenTelemetry tracing.
+
+With TRACING_ENABLED, every MCP request gets a span, with child spans for
+embedding requests and each Cypher statement. Cypher spans carry the
+statement's timings and update counters from its result summary. Spans are
+exported to an OTLP/HTTP collector or appended to a JSONL file, so tracing
+also works offline.
+
+Requires opentelemetry-sdk, plus opentelemetry-exporter-otlp-proto-http for
+the OTLP exporter. Without them, or with tracing disabled, span() is a no-op.
+"""
+import sys
+from contextlib import contextmanager
+
+from app.config import settings
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:
+    trace = None
+
+ENABLED = False
+_tracer = None
+_provider = None
+
+# Summary counters worth recording on Cypher spans, when non-zero
+_COUNTERS = (
+    "nodes_created", "nodes_deleted", "relationships_created", "relationships_deleted",
+    "properties_set", "indexes_added", "constraints_added",
+)
+
+
+def init_tracing() -> None:
+    """Sets up the tracer provider and exporter. Called on application startup."""
+    global ENABLED, _tracer, _provider
+    if not settings.TRACING_ENABLED or ENABLED:
+        return
+    if trace is None:
+        print("Tracing disabled: opentelemetry-sdk is not installed.", file=sys.stderr)
+        return
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+
+    if settings.TRACING_EXPORTER == "file":
+        out = open(settings.TRACING_FILE_PATH, "a", encoding="utf-8")
+        exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    elif settings.TRACING_EXPORTER == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            print("Tracing disabled: opentelemetry-exporter-otlp-proto-http is not installed.", file=sys.stderr)
+            return
+        # Endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables
+        exporter = OTLPSpanExporter()
+    else:
+        print(f"Tracing disabled: unknown TRACING_EXPORTER '{settings.TRACING_EXPORTER}'.", file=sys.stderr)
+        return
+
+    _provider = TracerProvider(resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}))
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    _tracer = _provider.get_tracer("borg-collective-memory")
+    ENABLED = True
+    print(f"Tracing enabled ({settings.TRACING_EXPORTER} exporter).", file=sys.stderr)
+
+
+def shutdown_tracing() -> None:
+    """Flushes pending spans. Called on application shutdown."""
+    global ENABLED
+    if _provider is not None:
+        _provider.shutdown()
+    ENABLED = False
+
+
+@contextmanager
+def span(name: str, attributes: dict | None = None):
+    """Runs the enclosed block in a child span of the current one. Yields None when tracing is off."""
+    if not ENABLED:
+        yield None
+        return
+    with _tracer.start_as_current_span(name, attributes=_clean(attributes or {})) as current:
+        yield current
+
+
+def set_attributes(current, attributes: dict) -> None:
+    if current is not None:
+        current.set_attributes(_clean(attributes))
+
+
+def set_error(current, message: str) -> None:
+    if current is not None:
+        current.set_status(Status(StatusCode.ERROR, message))
+
+
+def _clean(attributes: dict) -> dict:
+    # OpenTelemetry rejects None attribute values
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+class TracedSession:
+    """
+    Wraps a Neo4j session, or a transaction inside a managed transaction
+    function, so that every run() gets a span ending when its result is consumed.
+    """
+
+    def __init__(self, session):
+        self._session = session
+
+    async def execute_read(self, work, *args, **kwargs):
+        return await self._session.execute_read(lambda tx, *a, **kw: work(TracedSession(tx), *a, **kw), *args, **kwargs)
+
+    async def execute_write(self, work, *args, **kwargs):
+        return await self._session.execute_write(lambda tx, *a, **kw: work(TracedSession(tx), *a, **kw), *args, **kwargs)
+
+    async def run(self, query: str, parameters: dict | None = None, **kwargs):
+        current = _tracer.start_span("neo4j.run", attributes=_clean({
+            "db.system": "neo4j",
+            "db.statement": " ".join(query.split())[:1000],
+            "db.parameters": ",".join(sorted(parameters or {})) or None,
+        }))
+        try:
+            result = await self._session.run(query, parameters, **kwargs)
+        except Exception as e:
+            current.record_exception(e)
+            set_error(current, str(e))
+            current.end()
+            raise
+        return TracedResult(result, current)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class TracedResult:
+    """Delegates to a Neo4j result and ends its span with the summary once consumed."""
+
+    def __init__(self, result, current):
+        self._result = result
+        self._span = current
+        self._ended = False
+
+    async def _finish(self, summary=None, error: Exception | None = None) -> None:
+        if self._ended:
+            return
+        self._ended = True
+        try:
+            if error is not None:
+                self._span.record_exception(error)
+                set_error(self._span, str(error))
+            else:
+                summary = summary or await self._result.consume()
+                attributes = {
+                    "db.result_available_after_ms": summary.result_available_after,
+                    "db.result_consumed_after_ms": summary.result_consumed_after,
+                }
+                for counter in _COUNTERS:
+                    value = getattr(summary.counters, counter, 0)
+                    if value:
+                        attributes[f"db.counters.{counter}"] = value
+                set_attributes(self._span, attributes)
+        finally:
+            self._span.end()
+
+    async def data(self, *keys):
+        try:
+            records = await self._result.data(*keys)
+        except Exception as e:
+            await self._finish(error=e)
+            raise
+        await self._finish()
+        return records
+
+    async def single(self, strict: bool = False):
+        try:
+            record = await self._result.single(strict)
+        except Exception as e:
+            await self._finish(error=e)
+            raise
+        await self._finish()
+        return record
+
+    async def consume(self):
+        try:
+            summary = await self._result.consume()
+        except Exception as e:
+            await self._finish(error=e)
+            raise
+        await self._finish(summary)
+        return summary
+
+    async def __aiter__(self):
+        try:
+            async for record in self._result:
+                yield record
+        except GeneratorExit:
+            # The caller stopped iterating early; end the span without a summary
+            self._ended = True
+            self._span.end()
+            raise
+        except Exception as e:
+            await self._finish(error=e)
+            raise
+        await self._finish()
+
+    def __getattr__(self, name):
+        return getattr(self._result, name)
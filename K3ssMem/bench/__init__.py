@@ -0,0 +1 @@
+"""Benchmark and load-generation suite. See bench/README.md."""
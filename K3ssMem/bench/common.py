@@ -0,0 +1,94 @@
+"""Shared helpers for the benchmark scripts: an MCP client, vocabulary and statistics."""
+import itertools
+import json
+import random
+import sys
+import time
+
+import httpx
+
+ENTITY_PREFIX = "bench-entity-"
+ENTITY_TYPES = ["person", "project", "service", "concept", "document"]
+RELATION_TYPES = ["depends_on", "owns", "mentions", "related_to", "part_of"]
+WORDS = (
+    "graph memory vector index latency cache neo4j cypher embedding query node relation "
+    "observation batch pipeline replica cluster shard search ranking fusion keyword semantic "
+    "throughput concurrency transaction lock heap page store driver session pool timeout"
+).split()
+
+
+def entity_name(index: int) -> str:
+    return f"{ENTITY_PREFIX}{index}"
+
+
+def sentence(rng: random.Random, words: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+class MCPClient:
+    """Minimal JSON-RPC client for the /mcp endpoint."""
+
+    def __init__(self, url: str, concurrency: int, timeout: float = 120.0):
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        self.url = url
+        self.client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        self._ids = itertools.count(1)
+
+    async def call(self, tool: str, arguments: dict):
+        """Calls a tool and returns its result. Raises RuntimeError on a JSON-RPC error."""
+        response = await self.client.post(self.url, json={
+            "jsonrpc": "2.0",
+            "method": "tools/call",
+            "params": {"name": tool, "arguments": arguments},
+            "id": next(self._ids),
+        })
+        response.raise_for_status()
+        body = response.json()
+        if "error" in body:
+            raise RuntimeError(body["error"]["message"])
+        return body["result"]
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    """Latency percentiles in milliseconds and throughput in operations per second."""
+    values = sorted(latency * 1000 for latency in latencies)
+    return {
+        "ops": len(values),
+        "errors": errors,
+        "opsPerSec": round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50Ms": round(percentile(values, 0.50), 2),
+        "p95Ms": round(percentile(values, 0.95), 2),
+        "p99Ms": round(percentile(values, 0.99), 2),
+        "maxMs": round(values[-1], 2) if values else 0.0,
+    }
+
+
+def emit(report: dict, path: str | None) -> None:
+    """Writes the JSON report to path, or to stdout."""
+    text = json.dumps(report, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Report written to {path}", file=sys.stderr)
+    else:
+        print(text)
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
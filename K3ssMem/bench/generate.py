@@ -0,0 +1,118 @@
+"""
+Loads a synthetic knowledge graph through /mcp.
+
+Entities are named bench-entity-0 .. bench-entity-N-1 and get random
+observations and relations, so run.py can address them without reading the
+graph first. Reports load throughput as JSON.
+
+    python -m bench.generate --entities 10000 --observations 5 --degree 3
+"""
+import argparse
+import asyncio
+import random
+import sys
+
+from bench.common import (
+    ENTITY_TYPES, RELATION_TYPES, MCPClient, Timer, emit, entity_name, sentence, summarize,
+)
+
+
+async def run_batches(client: MCPClient, tool: str, key: str, items: list[dict], batch_size: int, concurrency: int) -> dict:
+    """Sends items in batches with bounded concurrency and summarizes per-batch latency."""
+    queue = [{key: items[i:i + batch_size]} for i in range(0, len(items), batch_size)][::-1]
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            arguments = queue.pop()
+            with Timer() as timer:
+                try:
+                    await client.call(tool, arguments)
+                except Exception as e:
+                    errors += 1
+                    print(f"{tool} failed: {e}", file=sys.stderr)
+                    continue
+            latencies.append(timer.elapsed)
+
+    with Timer() as total:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    summary = summarize(latencies, errors, total.elapsed)
+    summary["itemsPerSec"] = round(len(items) / total.elapsed, 2) if total.elapsed > 0 else 0.0
+    return summary
+
+
+async def clean(client: MCPClient, entities: int) -> None:
+    """Deletes bench entities left by a previous run, in the background, and waits for it."""
+    names = [entity_name(i) for i in range(entities)]
+    result = await client.call("delete_entities", {"entityNames": names, "background": True})
+    job_id = result["content"][0]["text"].split("Job ID: ")[1].split()[0]
+    while True:
+        status = (await client.call("get_job_status", {"jobId": job_id}))["content"][0]["json"]
+        if status["status"] != "running":
+            break
+        await asyncio.sleep(0.5)
+
+
+async def generate(args) -> dict:
+    rng = random.Random(args.seed)
+    client = MCPClient(args.url, args.concurrency)
+    try:
+        if args.clean:
+            await clean(client, args.entities)
+
+        entities = [
+            {
+                "name": entity_name(i),
+                "entityType": rng.choice(ENTITY_TYPES),
+                "observations": [sentence(rng) for _ in range(args.observations)],
+            }
+            for i in range(args.entities)
+        ]
+        relations = [
+            {
+                "from": entity_name(i),
+                "to": entity_name(rng.randrange(args.entities)),
+                "relationType": rng.choice(RELATION_TYPES),
+                "strength": round(rng.random(), 2),
+            }
+            for i in range(args.entities) for _ in range(args.degree)
+        ]
+
+        report = {
+            "entities": args.entities,
+            "observationsPerEntity": args.observations,
+            "relations": len(relations),
+            "batchSize": args.batch_size,
+            "concurrency": args.concurrency,
+        }
+        report["create_entities"] = await run_batches(
+            client, "create_entities", "entities", entities, args.batch_size, args.concurrency
+        )
+        report["create_relations"] = await run_batches(
+            client, "create_relations", "relations", relations, args.batch_size, args.concurrency
+        )
+        return report
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/mcp")
+    parser.add_argument("--entities", type=int, default=1000)
+    parser.add_argument("--observations", type=int, default=5, help="Observations per entity")
+    parser.add_argument("--degree", type=int, default=3, help="Outgoing relations per entity")
+    parser.add_argument("--batch-size", type=int, default=100, help="Items per create_* call")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--clean", action="store_true", help="Delete bench entities from a previous run first")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    emit(asyncio.run(generate(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Drives every MCP tool through /mcp and reports latency and throughput.
+
+Run generate.py first with the same --entities. Each scenario issues --ops
+calls at --concurrency and reports p50/p95/p99 latency and ops/sec as JSON.
+Write scenarios only touch data they created, so the graph is left as loaded.
+
+    python -m bench.run --entities 10000 --concurrency 16 --ops 500 --output report.json
+
+Read results are cached by the server; start it with RESULT_CACHE_ENABLED=false
+to measure the uncached paths, or use a large --entities so queries rarely repeat.
+"""
+import argparse
+import asyncio
+import platform
+import random
+import sys
+import time
+import uuid
+
+from bench.common import MCPClient, Timer, emit, entity_name, sentence, summarize
+
+# Scenario name -> tool. Order matters: deletes consume what earlier scenarios created.
+SCENARIOS = {
+    "semantic_search": "semantic_search",
+    "semantic_search_fulltext": "semantic_search",
+    "semantic_search_hybrid": "semantic_search",
+    "semantic_search_expand": "semantic_search",
+    "open_nodes": "open_nodes",
+    "read_graph": "read_graph",
+    "export_graph": "export_graph",
+    "get_job_status": "get_job_status",
+    "create_entities": "create_entities",
+    "import_graph": "import_graph",
+    "add_observations": "add_observations",
+    "create_relations": "create_relations",
+    "delete_relations": "delete_relations",
+    "delete_observations": "delete_observations",
+    "delete_entities": "delete_entities",
+}
+
+
+class Workload:
+    """Builds the arguments of each call, tracking what the write scenarios created."""
+
+    def __init__(self, entities: int, seed: int):
+        self.entities = entities
+        self.rng = random.Random(seed)
+        self.run_id = uuid.uuid4().hex[:8]
+        self.created: list[str] = []
+        self.observations: list[tuple[str, str]] = []
+        self.relations: list[dict] = []
+        self.job_id: str | None = None
+        self._next = 0
+
+    def existing(self) -> str:
+        return entity_name(self.rng.randrange(self.entities))
+
+    def fresh(self) -> str:
+        self._next += 1
+        return f"bench-run-{self.run_id}-{self._next}"
+
+    def arguments(self, scenario: str) -> dict:
+        rng = self.rng
+        if scenario == "semantic_search":
+            return {"query": sentence(rng, 4), "limit": 10}
+        if scenario == "semantic_search_fulltext":
+            return {"query": sentence(rng, 2), "limit": 10, "search_mode": "fulltext"}
+        if scenario == "semantic_search_hybrid":
+            return {"query": sentence(rng, 4), "limit": 10, "search_mode": "hybrid"}
+        if scenario == "semantic_search_expand":
+            return {"query": sentence(rng, 4), "limit": 5, "expand_hops": 2}
+        if scenario == "open_nodes":
+            return {"names": [self.existing() for _ in range(5)]}
+        if scenario == "read_graph":
+            return {"cursor": self.existing(), "limit": 100}
+        if scenario == "export_graph":
+            # Written under the server's BULK_DIRECTORY
+            return {"path": f"bench-{self.run_id}.jsonl"}
+        if scenario == "get_job_status":
+            return {"jobId": self.job_id}
+        if scenario == "create_entities":
+            names = [self.fresh() for _ in range(10)]
+            self.created.extend(names)
+            return {"entities": [
+                {"name": name, "entityType": "bench", "observations": [sentence(rng) for _ in range(3)]}
+                for name in names
+            ]}
+        if scenario == "import_graph":
+            names = [self.fresh() for _ in range(10)]
+            self.created.extend(names)
+            records = [
+                {"type": "entity", "name": name, "entityType": "bench", "observations": [sentence(rng) for _ in range(3)]}
+                for name in names
+            ]
+            records += [
+                {"type": "relation", "from": from_name, "to": to_name, "relationType": f"bench_{self.run_id}"}
+                for from_name, to_name in zip(names, names[1:])
+            ]
+            return {"records": records}
+        if scenario == "add_observations":
+            name = self.existing()
+            observation = f"{sentence(rng)} {self.run_id}"
+            self.observations.append((name, observation))
+            return {"observations": [{"entityName": name, "contents": [observation]}]}
+        if scenario == "create_relations":
+            relation = {"from": self.existing(), "to": self.existing(), "relationType": f"bench_{self.run_id}"}
+            self.relations.append(relation)
+            return {"relations": [relation]}
+        if scenario == "delete_relations":
+            relation = self.relations.pop() if self.relations else {"from": self.existing(), "to": self.existing(), "relationType": f"bench_{self.run_id}"}
+            return {"relations": [relation]}
+        if scenario == "delete_observations":
+            name, observation = self.observations.pop() if self.observations else (self.existing(), self.run_id)
+            return {"deletions": [{"entityName": name, "observations": [observation]}]}
+        if scenario == "delete_entities":
+            names = [self.created.pop() for _ in range(min(10, len(self.created)))] or [self.fresh()]
+            return {"entityNames": names}
+        raise ValueError(f"Unknown scenario '{scenario}'")
+
+
+async def run_scenario(client: MCPClient, workload: Workload, scenario: str, ops: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors: list[str] = []
+    remaining = ops
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            arguments = workload.arguments(scenario)
+            with Timer() as timer:
+                try:
+                    await client.call(SCENARIOS[scenario], arguments)
+                except Exception as e:
+                    errors.append(str(e))
+                    continue
+            latencies.append(timer.elapsed)
+
+    with Timer() as total:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    summary = summarize(latencies, len(errors), total.elapsed)
+    if errors:
+        summary["firstError"] = errors[0]
+    return summary
+
+
+async def start_job(client: MCPClient, workload: Workload) -> None:
+    """Starts a small background delete so get_job_status has a job to poll."""
+    result = await client.call("delete_entities", {"entityNames": [workload.fresh()], "background": True})
+    workload.job_id = result["content"][0]["text"].split("Job ID: ")[1].split()[0]
+
+
+async def run(args) -> dict:
+    scenarios = args.scenarios or list(SCENARIOS)
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}. Choose from: {', '.join(SCENARIOS)}")
+
+    workload = Workload(args.entities, args.seed)
+    client = MCPClient(args.url, args.concurrency)
+    report = {
+        "startedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "url": args.url,
+        "entities": args.entities,
+        "concurrency": args.concurrency,
+        "opsPerScenario": args.ops,
+        "python": platform.python_version(),
+        "scenarios": {},
+    }
+    try:
+        if "get_job_status" in scenarios:
+            await start_job(client, workload)
+        # Ordered so writes consume only what earlier write scenarios created
+        for scenario in (name for name in SCENARIOS if name in scenarios):
+            if args.warmup:
+                await run_scenario(client, workload, scenario, args.warmup, args.concurrency)
+            result = await run_scenario(client, workload, scenario, args.ops, args.concurrency)
+            report["scenarios"][scenario] = result
+            print(f"{scenario}: {result['opsPerSec']} ops/s, p50 {result['p50Ms']} ms, p99 {result['p99Ms']} ms, {result['errors']} errors", file=sys.stderr)
+    finally:
+        await client.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/mcp")
+    parser.add_argument("--entities", type=int, default=1000, help="Size of the graph loaded by generate.py")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200, help="Calls per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed calls before each scenario")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run (default: all). One of: {', '.join(SCENARIOS)}")
+    args = parser.parse_args()
+
+    emit(asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
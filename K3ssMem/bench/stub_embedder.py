@@ -0,0 +1,78 @@
+"""
+Stub embedding server that mimics Ollama's /api/embeddings and /api/embed.
+
+Vectors are deterministic (derived from a hash of the text) and unit length,
+so repeated texts embed identically and the vector index behaves normally.
+Latency is simulated per request plus per embedded text.
+
+    python -m bench.stub_embedder --port 11435 --latency-ms 20 --per-text-ms 2
+"""
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+app = FastAPI(title="Stub embedder")
+config = {"dimensions": 768, "latency_ms": 0.0, "per_text_ms": 0.0}
+counters = {"requests": 0, "texts": 0}
+
+
+def embed(text: str) -> list[float]:
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    vector = [rng.gauss(0.0, 1.0) for _ in range(config["dimensions"])]
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    return [value / norm for value in vector]
+
+
+async def simulate_latency(texts: int) -> None:
+    delay = config["latency_ms"] + config["per_text_ms"] * texts
+    if delay > 0:
+        await asyncio.sleep(delay / 1000)
+
+
+@app.post("/api/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    counters["requests"] += 1
+    counters["texts"] += 1
+    await simulate_latency(1)
+    return {"embedding": embed(body.get("prompt", ""))}
+
+
+@app.post("/api/embed")
+async def embed_batch(request: Request):
+    body = await request.json()
+    texts = body.get("input", [])
+    if isinstance(texts, str):
+        texts = [texts]
+    counters["requests"] += 1
+    counters["texts"] += len(texts)
+    await simulate_latency(len(texts))
+    return {"model": body.get("model"), "embeddings": [embed(text) for text in texts]}
+
+
+@app.get("/stats")
+def stats():
+    return {**config, **counters}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Fixed latency per request")
+    parser.add_argument("--per-text-ms", type=float, default=0.0, help="Additional latency per embedded text")
+    args = parser.parse_args()
+
+    config.update(dimensions=args.dimensions, latency_ms=args.latency_ms, per_text_ms=args.per_text_ms)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
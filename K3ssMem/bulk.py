@@ -0,0 +1,58 @@
+"""
+Bulk import and export of the knowledge graph from the command line.
+
+    python bulk.py export backup.jsonl --embeddings
+    python bulk.py import backup.jsonl
+    python bulk.py import - --reembed < other.jsonl
+
+Connects to Neo4j and the embedding service with the same settings as the
+server. Files use the JSONL format of GET /graph/stream; '-' means stdin or
+stdout. Imports keep the embeddings found in the file unless --reembed is
+given. A running server keeps serving cached read results until they expire
+(RESULT_CACHE_TTL).
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from app import bulk, lifecycle
+
+
+async def run(args) -> dict:
+    neo4j_client = await lifecycle.start_services()
+    if neo4j_client is None:
+        raise SystemExit("Could not connect to Neo4j.")
+    try:
+        if args.command == "export":
+            return await bulk.export_graph(neo4j_client, args.path, include_embeddings=args.embeddings)
+
+        def on_progress(**progress):
+            print(f"Imported {progress['entities']} entities, {progress['relations']} relations", file=sys.stderr)
+
+        return await bulk.import_graph(
+            neo4j_client, bulk.read_records(args.path), reembed=args.reembed, on_progress=on_progress
+        )
+    finally:
+        await lifecycle.stop_services(neo4j_client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write the graph to a JSONL file")
+    export_parser.add_argument("path", help="Output file, or - for stdout")
+    export_parser.add_argument("--embeddings", action="store_true", help="Include stored embeddings")
+    import_parser = commands.add_parser("import", help="Load entities and relations from a JSONL file")
+    import_parser.add_argument("path", help="Input file, or - for stdin")
+    import_parser.add_argument("--reembed", action="store_true", help="Recompute embeddings even when the file has them")
+    args = parser.parse_args()
+
+    # Keep stdout for the exported records; the app's log output goes to stderr
+    sys.stdout = sys.stderr
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
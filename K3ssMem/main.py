@@ -1,11 +1,18 @@
-import sys
+import asyncio
 import httpx
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 
-from app.config import settings
-from app.neo4j_client import Neo4jClient
-from app.mcp_handler import handle_mcp_request
+from app.embedding_cache import embedding_cache
+from app.embedding_worker import embedding_worker
+from app.lifecycle import start_services, stop_services
+from app import metrics
+from app.neo4j_client import Neo4jClient, normalize_entity_fields
+from app.mcp_handler import OFFLINE_METHODS, handle_mcp_batch, handle_mcp_request
+from app.result_cache import result_cache
+from app.schema import schema_status
+from app.serialization import COMPRESS_IN_THREAD_BYTES, dumps, encode_body, loads
+from app.tools import tools_list_response
 
 app = FastAPI(
     title="The Borg Collective Memory System",
@@ -17,37 +24,113 @@ neo4j_client: Neo4jClient | None = None
 
 @app.on_event("startup")
 async def startup_event():
-    """On startup, connect to the Neo4j database."""
+    """On startup, open the embedding client and connect to the Neo4j database."""
     global neo4j_client
-    neo4j_client = Neo4jClient(uri=settings.NEO4J_URI, user=settings.NEO4J_USER, password=settings.NEO4J_PASSWORD)
-    try:
-        await neo4j_client.verify_connection()
-        print("Successfully connected to Neo4j.", file=sys.stderr)
-    except Exception as e:
-        print(f"Failed to connect to Neo4j: {e}", file=sys.stderr)
-        # In a real app, you might want to prevent startup if the DB is down.
-        neo4j_client = None
+    neo4j_client = await start_services()
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """On shutdown, close the connection to the Neo4j database."""
-    if neo4j_client:
-        await neo4j_client.close()
-        print("Neo4j connection closed.", file=sys.stderr)
+    """On shutdown, stop background jobs, then close the Neo4j connection and the embedding client."""
+    await stop_services(neo4j_client)
 
 @app.get("/")
 def read_root():
     return {"message": "The Borg is online. Resistance is futile."}
 
+@app.get("/stats")
+def read_stats():
+    """Exposes cache hit/miss counters and the write-behind embedding worker's progress."""
+    return {
+        "embeddingCache": embedding_cache.stats(),
+        "resultCache": result_cache.stats(),
+        "embeddingWorker": embedding_worker.stats(),
+    }
+
+@app.get("/metrics")
+def read_metrics():
+    """Prometheus metrics: per-tool latency and errors, stage timings, caches and the Neo4j pool."""
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled. Install prometheus_client and set METRICS_ENABLED=true.")
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/schema")
+async def read_schema():
+    """Reports the state of the graph's indexes and constraints."""
+    if not neo4j_client:
+        raise HTTPException(status_code=503, detail="Database connection not available.")
+    return {"schema": await schema_status(neo4j_client)}
+
+@app.get("/graph/stream")
+async def stream_graph(cursor: str | None = None, limit: int | None = None, fields: str | None = None, relations: bool = True):
+    """
+    Streams the knowledge graph as NDJSON, one entity or relation per line,
+    as records arrive from Neo4j. fields is a comma-separated projection.
+    """
+    if not neo4j_client:
+        raise HTTPException(status_code=503, detail="Database connection not available.")
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    try:
+        field_list = normalize_entity_fields(field_list)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def ndjson_lines():
+        async for record in neo4j_client.stream_graph(cursor, limit, field_list, relations):
+            yield dumps(record) + b"\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+async def json_response(request: Request, content=None, body: bytes | None = None) -> Response:
+    """
+    Serializes content (or sends pre-serialized body) as JSON, compressed
+    with the best coding the client accepts once it is large enough.
+    """
+    with metrics.time_stage("serialization"):
+        if body is None:
+            body = dumps(content)
+        accept_encoding = request.headers.get("accept-encoding")
+        if len(body) > COMPRESS_IN_THREAD_BYTES:
+            # Compressing a large graph takes long enough to stall other requests
+            body, encoding = await asyncio.to_thread(encode_body, body, accept_encoding)
+        else:
+            body, encoding = encode_body(body, accept_encoding)
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.post("/mcp")
 async def mcp_endpoint(request: Request):
     """
     Main MCP endpoint. This will handle all incoming JSON-RPC requests.
     """
     # Allow initialize before neo4j is ready
-    mcp_body = await request.json()
+    mcp_body = loads(await request.body())
+    
+    # JSON-RPC batch: an array of requests answered with an array of responses
+    if isinstance(mcp_body, list):
+        if not mcp_body:
+            return await json_response(request, {
+                "jsonrpc": "2.0",
+                "error": {"code": -32600, "message": "Invalid Request: empty batch"},
+                "id": None
+            })
+        methods = {item.get("method") for item in mcp_body if isinstance(item, dict)}
+        if methods - OFFLINE_METHODS and not neo4j_client:
+            raise HTTPException(status_code=503, detail="Database connection not available.")
+        
+        responses = await handle_mcp_batch(mcp_body, neo4j_client)
+        if not responses:
+            return JSONResponse(content={}, status_code=204)
+        return await json_response(request, responses)
+    
     method = mcp_body.get("method")
     
+    # The tool list is serialized once at import and needs no database either
+    if method == "tools/list":
+        return await json_response(request, body=tools_list_response(mcp_body.get("id")))
+    
     # Initialize doesn't need database connection
     if method != "initialize" and not neo4j_client:
         raise HTTPException(status_code=503, detail="Database connection not available.")
@@ -59,4 +142,4 @@ async def mcp_endpoint(request: Request):
     if response_body is None:
         return JSONResponse(content={}, status_code=204)
     
-    return JSONResponse(content=response_body)
+    return await json_response(request, response_body)
@@ -2,51 +2,285 @@
 """
 STDIO MCP Server Bridge for Borg Collective Memory
 Bridges STDIO (for Perplexity/Claude) to HTTP (localhost:8000)
+
+Messages are forwarded concurrently over one pooled keep-alive connection,
+and responses are written back as they complete, so a slow semantic search
+does not hold up the calls queued behind it. Writes are still applied in
+order: a write waits for the messages before it and holds up the ones after it.
+
+With --in-process (or BORG_STDIO_MODE=inprocess) no HTTP server is needed:
+this process owns the Neo4j client and calls the MCP handler directly.
+
+Messages are written as compact JSON (orjson when installed); set
+BORG_STDIO_COMPACT=0 for the previous spaced, ASCII-escaped output.
 """
-import sys
+import asyncio
 import json
-import requests
+import os
+import sys
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HTTP_ENDPOINT = os.getenv("BORG_HTTP_ENDPOINT", "http://localhost:8000/mcp")
+# Maximum number of messages forwarded at the same time
+MAX_IN_FLIGHT = int(os.getenv("BORG_STDIO_MAX_IN_FLIGHT", "16"))
+REQUEST_TIMEOUT = float(os.getenv("BORG_STDIO_TIMEOUT", "30"))
+# Largest accepted stdin line; big create_entities payloads exceed asyncio's 64 KiB default
+MAX_LINE_BYTES = 64 * 1024 * 1024
+# Compact output skips whitespace and \u-escaping, which adds up on large graph reads
+COMPACT = os.getenv("BORG_STDIO_COMPACT", "1").lower() not in ("0", "false", "no")
+# The server compresses responses the client accepts; over loopback that only costs CPU
+ACCEPT_ENCODING = os.getenv("BORG_STDIO_ACCEPT_ENCODING", "identity")
+
+# Tools that only read the graph (read_only in app/tools.py). The HTTP bridge
+# does not import the app, so it keeps its own list; other tools are ordered as writes.
+READ_TOOLS = frozenset({"semantic_search", "read_graph", "open_nodes", "get_job_status", "export_graph"})
+
+# The real stdout carries the protocol. In in-process mode sys.stdout is pointed
+# at stderr so print() calls in the app cannot corrupt the message stream.
+PROTOCOL_OUT = sys.stdout
+
+
+def encode_message(message) -> bytes:
+    """Serializes a JSON-RPC message as a single UTF-8 line, without the newline."""
+    if not COMPACT:
+        return json.dumps(message).encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(message, default=str)
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+
+def decode_message(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def write_message(message) -> None:
+    """Writes one JSON-RPC message to stdout as a single line."""
+    line = encode_message(message) + b"\n"
+    buffer = getattr(PROTOCOL_OUT, "buffer", None)
+    if buffer is not None:
+        PROTOCOL_OUT.flush()
+        buffer.write(line)
+        buffer.flush()
+    else:
+        PROTOCOL_OUT.write(line.decode("utf-8"))
+        PROTOCOL_OUT.flush()
+
+
+def error_response(code: int, message: str, request_id=None) -> dict:
+    return {
+        "jsonrpc": "2.0",
+        "error": {"code": code, "message": message},
+        "id": request_id
+    }
+
+
+def expects_response(message) -> bool:
+    """Notifications (requests without an id) must not be answered. An empty batch gets an error."""
+    if isinstance(message, list):
+        return not message or any(expects_response(item) for item in message)
+    return isinstance(message, dict) and "id" in message
+
+
+def is_read_message(message) -> bool:
+    """Whether a message leaves the graph untouched. A batch is a read only if all its requests are."""
+    if isinstance(message, list):
+        return all(is_read_message(item) for item in message)
+    if not isinstance(message, dict) or message.get("method") != "tools/call":
+        return True
+    return (message.get("params") or {}).get("name") in READ_TOOLS
+
+
+class WriteBarrier:
+    """
+    Orders pipelined messages the way handle_mcp_batch orders a batch:
+    consecutive reads run concurrently, while a write waits for every
+    message before it and every message after it waits for the write.
+    """
+
+    def __init__(self):
+        self._write: asyncio.Task | None = None
+        self._reads: set[asyncio.Task] = set()
+
+    def start(self, message, run) -> asyncio.Task:
+        """Runs the coroutine function run once the messages message must follow are done."""
+        after = [self._write] if self._write is not None else []
+        if is_read_message(message):
+            task = asyncio.create_task(self._run_after(after, run))
+            self._reads.add(task)
+            task.add_done_callback(self._reads.discard)
+        else:
+            task = asyncio.create_task(self._run_after(after + list(self._reads), run))
+            self._write = task
+            self._reads = set()
+        return task
 
-HTTP_ENDPOINT = "http://localhost:8000/mcp"
+    @staticmethod
+    async def _run_after(after: list[asyncio.Task], run) -> None:
+        if after:
+            await asyncio.wait(after)
+        await run()
+
+
+class HttpDispatcher:
+    """Forwards messages to the FastAPI server over a pooled keep-alive client."""
+
+    async def start(self) -> None:
+        import httpx
+
+        limits = httpx.Limits(max_connections=MAX_IN_FLIGHT, max_keepalive_connections=MAX_IN_FLIGHT)
+        self.client = httpx.AsyncClient(
+            limits=limits,
+            timeout=REQUEST_TIMEOUT,
+            headers={"Content-Type": "application/json", "Accept-Encoding": ACCEPT_ENCODING},
+        )
+
+    async def dispatch(self, message):
+        """Forward MCP message to HTTP endpoint and return response (None for a notification's 204)."""
+        response = await self.client.post(HTTP_ENDPOINT, content=encode_message(message))
+        if response.status_code == 204:
+            return None
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text or response.reason_phrase
+            raise RuntimeError(f"HTTP {response.status_code}: {detail}")
+        return decode_message(response.content)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class InProcessDispatcher:
+    """
+    Calls the MCP handler directly, skipping the HTTP hop and the second JSON
+    round trip. The app modules (Neo4j driver, pydantic settings) are
+    imported in a background thread while stdin is already being read, and
+    initialize and tools/list are answered as soon as they load, without
+    waiting for Neo4j. The schema bootstrap runs in the background once
+    the connection is up, so tool calls do not wait for indexes either.
+    """
+
+    async def start(self) -> None:
+        self._modules = asyncio.create_task(asyncio.to_thread(self._import_modules))
+        self._client = asyncio.create_task(self._connect())
+
+    @staticmethod
+    def _import_modules():
+        from app import lifecycle, mcp_handler
+        return lifecycle, mcp_handler
+
+    async def _connect(self):
+        lifecycle, _ = await self._modules
+        return await lifecycle.start_services(background_schema=True)
+
+    @staticmethod
+    def _needs_database(message, mcp_handler) -> bool:
+        if isinstance(message, list):
+            return any(InProcessDispatcher._needs_database(item, mcp_handler) for item in message)
+        return not isinstance(message, dict) or message.get("method") not in mcp_handler.OFFLINE_METHODS
+
+    async def dispatch(self, message):
+        _, mcp_handler = await self._modules
+        if isinstance(message, list) and not message:
+            return error_response(-32600, "Invalid Request: empty batch")
+
+        neo4j_client = None
+        if self._needs_database(message, mcp_handler):
+            neo4j_client = await self._client
+            if neo4j_client is None:
+                raise RuntimeError("Database connection not available.")
+        if isinstance(message, list):
+            return await mcp_handler.handle_mcp_batch(message, neo4j_client) or None
+        return await mcp_handler.handle_mcp_request(message, neo4j_client)
+
+    async def close(self) -> None:
+        lifecycle, _ = await self._modules
+        await lifecycle.stop_services(await self._client)
+
+
+async def process_message(dispatcher, message, semaphore: asyncio.Semaphore) -> None:
+    """Dispatches and answers one parsed message."""
+    try:
+        async with semaphore:
+            response = await dispatcher.dispatch(message)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        if isinstance(message, dict) and "id" in message:
+            write_message(error_response(-32603, f"Internal error: {e}", message["id"]))
+        elif isinstance(message, list):
+            write_message([
+                error_response(-32603, f"Internal error: {e}", item.get("id"))
+                for item in message if isinstance(item, dict) and "id" in item
+            ])
+        return
+
+    if response is None or not expects_response(message):
+        return
+    # Responses complete out of order; each must carry its own request's id
+    if isinstance(message, dict) and isinstance(response, dict):
+        response["id"] = message["id"]
+    write_message(response)
+
+
+async def stdin_lines():
+    """Yields stdin lines without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=MAX_LINE_BYTES)
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except (NotImplementedError, ValueError, OSError):
+        # Not a pipe (e.g. a redirected file) or no pipe support on this platform
+        while line := await asyncio.to_thread(sys.stdin.buffer.readline):
+            yield line
+        return
+    while line := await reader.readline():
+        yield line
+
+
+async def run_bridge(dispatcher) -> None:
+    """Reads messages from stdin and dispatches them with bounded concurrency, keeping writes in order."""
+    semaphore = asyncio.Semaphore(MAX_IN_FLIGHT)
+    barrier = WriteBarrier()
+    tasks: set[asyncio.Task] = set()
+
+    await dispatcher.start()
+    try:
+        async for line in stdin_lines():
+            if not line.strip():
+                continue
+            try:
+                # Parse incoming JSON-RPC message
+                message = decode_message(line)
+            except ValueError as e:
+                write_message(error_response(-32700, f"Parse error: {e}"))
+                continue
+            task = barrier.start(message, lambda message=message: process_message(dispatcher, message, semaphore))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        # Finish in-flight messages before exiting on EOF
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        await dispatcher.close()
 
-def handle_message(message: dict) -> dict:
-    """Forward MCP message to HTTP endpoint and return response."""
-    response = requests.post(HTTP_ENDPOINT, json=message, timeout=30)
-    return response.json()
 
 def main():
     """Main STDIO loop - read from stdin, write to stdout."""
+    in_process = "--in-process" in sys.argv[1:] or os.getenv("BORG_STDIO_MODE", "").lower() == "inprocess"
     # Ensure stderr is used for logging
-    print("Borg Collective STDIO MCP Server starting...", file=sys.stderr)
-    
-    # Read from stdin line by line
-    for line in sys.stdin:
-        try:
-            # Parse incoming JSON-RPC message
-            message = json.loads(line.strip())
-            
-            # Forward to HTTP endpoint
-            response = handle_message(message)
-            
-            # Write response to stdout
-            print(json.dumps(response), flush=True)
-            
-        except json.JSONDecodeError as e:
-            error_response = {
-                "jsonrpc": "2.0",
-                "error": {"code": -32700, "message": f"Parse error: {e}"},
-                "id": None
-            }
-            print(json.dumps(error_response), flush=True)
-            
-        except Exception as e:
-            error_response = {
-                "jsonrpc": "2.0",
-                "error": {"code": -32603, "message": f"Internal error: {e}"},
-                "id": message.get("id") if 'message' in locals() else None
-            }
-            print(json.dumps(error_response), flush=True)
-            print(f"Error: {e}", file=sys.stderr)
+    print(f"Borg Collective STDIO MCP Server starting ({'in-process' if in_process else 'HTTP bridge'})...", file=sys.stderr)
+    if in_process:
+        sys.stdout = sys.stderr
+    asyncio.run(run_bridge(InProcessDispatcher() if in_process else HttpDispatcher()))
+
 
 if __name__ == "__main__":
     main()
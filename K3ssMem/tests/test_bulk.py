@@ -0,0 +1,94 @@
+import asyncio
+import os
+
+import pytest
+
+from app import bulk
+from app.config import settings
+
+
+@pytest.fixture
+def bulk_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "BULK_DIRECTORY", str(tmp_path))
+    return os.path.realpath(tmp_path)
+
+
+def test_resolve_path_inside_bulk_directory(bulk_directory):
+    assert bulk.resolve_path("exports/graph.jsonl") == os.path.join(bulk_directory, "exports", "graph.jsonl")
+    assert bulk.resolve_path("exports/../graph.jsonl") == os.path.join(bulk_directory, "graph.jsonl")
+
+
+@pytest.mark.parametrize("path", ["../graph.jsonl", "exports/../../graph.jsonl", "/etc/passwd", ".."])
+def test_resolve_path_rejects_escapes(bulk_directory, path):
+    with pytest.raises(ValueError, match="outside the bulk directory"):
+        bulk.resolve_path(path)
+
+
+def test_resolve_path_rejects_symlinks_out(bulk_directory, tmp_path_factory):
+    outside = tmp_path_factory.mktemp("outside")
+    os.symlink(outside, os.path.join(bulk_directory, "link"))
+    with pytest.raises(ValueError):
+        bulk.resolve_path("link/graph.jsonl")
+
+
+class FakeClient:
+    """Records when each chunk is written; entity writes are slow."""
+
+    def __init__(self):
+        self.log: list[tuple[str, str, tuple]] = []
+
+    async def import_entities(self, entities, reembed=False):
+        names = tuple(entity["name"] for entity in entities)
+        self.log.append(("start", "entities", names))
+        await asyncio.sleep(0.01)
+        self.log.append(("end", "entities", names))
+        return {"entities": len(entities), "created": len(entities), "embedded": len(entities), "pending": 0}
+
+    async def import_relations(self, relations):
+        pairs = tuple((relation["from"], relation["to"]) for relation in relations)
+        self.log.append(("start", "relations", pairs))
+        self.log.append(("end", "relations", pairs))
+        return {"relations": len(relations), "created": len(relations)}
+
+
+def entity(name):
+    return {"type": "entity", "name": name, "entityType": "test"}
+
+
+def relation(from_name, to_name):
+    return {"type": "relation", "from": from_name, "to": to_name, "relationType": "knows"}
+
+
+def test_relations_wait_for_earlier_entity_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_CHUNK_SIZE", 2)
+    client = FakeClient()
+    records = [
+        entity("a"), entity("b"), entity("c"),
+        relation("a", "c"),
+        entity("d"),
+        relation("c", "d"), {"type": "end"},
+    ]
+
+    result = asyncio.run(bulk.import_graph(client, records))
+
+    assert (result["entities"], result["relations"]) == (4, 2)
+    starts = [(kind, items) for event, kind, items in client.log if event == "start"]
+    assert starts == [
+        ("entities", ("a", "b")),
+        ("entities", ("c",)),
+        ("relations", (("a", "c"),)),
+        ("entities", ("d",)),
+        ("relations", (("c", "d"),)),
+    ]
+    # Every relation chunk starts after all entity chunks before it have finished
+    for index, (event, kind, _) in enumerate(client.log):
+        if event == "start" and kind == "relations":
+            earlier = client.log[:index]
+            started = sum(1 for entry in earlier if entry[:2] == ("start", "entities"))
+            finished = sum(1 for entry in earlier if entry[:2] == ("end", "entities"))
+            assert started == finished
+
+
+def test_unknown_record_type_is_rejected():
+    with pytest.raises(ValueError, match="Unknown record type"):
+        asyncio.run(bulk.import_graph(FakeClient(), [{"type": "node"}]))
@@ -0,0 +1,66 @@
+import asyncio
+
+from app.embedding_cache import EmbeddingCache
+
+# Four float32 values pack into 16 bytes
+VECTOR_BYTES = 16
+
+
+def vector(value: float) -> list[float]:
+    return [value] * 4
+
+
+def test_put_past_max_bytes_evicts_least_recently_used():
+    cache = EmbeddingCache(max_bytes=2 * VECTOR_BYTES)
+
+    async def run():
+        await cache.put_many({"a": vector(1.0), "b": vector(2.0)})
+        # Reading a makes b the least recently used entry
+        await cache.get_many(["a"])
+        await cache.put_many({"c": vector(3.0)})
+        return await cache.get_many(["a", "b", "c"])
+
+    found = asyncio.run(run())
+
+    assert found == {"a": vector(1.0), "c": vector(3.0)}
+    assert cache.stats()["bytes"] == 2 * VECTOR_BYTES
+
+
+def test_vector_larger_than_max_bytes_is_not_stored():
+    cache = EmbeddingCache(max_bytes=VECTOR_BYTES - 1)
+    asyncio.run(cache.put_many({"a": vector(1.0)}))
+    assert cache.stats()["entries"] == 0
+
+
+def test_disk_hit_is_promoted_into_memory(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    writer = EmbeddingCache(max_bytes=VECTOR_BYTES, path=path)
+    asyncio.run(writer.put_many({"a": vector(1.0)}))
+    writer.close()
+
+    cache = EmbeddingCache(max_bytes=VECTOR_BYTES, path=path)
+    try:
+        assert asyncio.run(cache.get_many(["a"])) == {"a": vector(1.0)}
+        assert cache.stats()["entries"] == 1
+        cache.path = None  # A second lookup must be served from memory
+        assert asyncio.run(cache.get_many(["a"])) == {"a": vector(1.0)}
+    finally:
+        cache.close()
+
+    assert cache.disk_hits == 1
+    assert cache.hits == 1
+
+
+def test_counters():
+    cache = EmbeddingCache(max_bytes=4 * VECTOR_BYTES)
+
+    async def run():
+        await cache.put_many({"a": vector(1.0)})
+        await cache.get_many(["a", "b"])
+        await cache.get_many(["a"])
+
+    asyncio.run(run())
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["diskHits"], stats["misses"]) == (2, 0, 1)
+    assert stats["hitRate"] == 2 / 3
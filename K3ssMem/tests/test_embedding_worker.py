@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from app.embedding_worker import EmbeddingWorker
+
+
+class FakeClient:
+    """Rejects any batch containing a poisoned entity, like a backend refusing one text."""
+
+    def __init__(self, poisoned: set[str]):
+        self.poisoned = poisoned
+        self.embedded: list[str] = []
+        self.failures: list[str] = []
+
+    async def embed_pending(self, records):
+        if any(record["name"] in self.poisoned for record in records):
+            raise RuntimeError("rejected")
+        self.embedded.extend(record["name"] for record in records)
+
+    async def record_embedding_failures(self, names, error, max_attempts):
+        self.failures.extend(names)
+        return []
+
+
+def embed(client, names):
+    worker = EmbeddingWorker()
+    worker._neo4j_client = client
+    return asyncio.run(worker._embed([{"name": name, "observations": []} for name in names]))
+
+
+def test_failed_batch_is_retried_per_entity():
+    client = FakeClient({"bad"})
+    assert embed(client, ["a", "bad", "b"]) == 2
+    assert client.embedded == ["a", "b"]
+    assert client.failures == ["bad"]
+
+
+def backend(monkeypatch, up: bool):
+    async def check_embedding_backend():
+        if not up:
+            raise ConnectionError("connection refused")
+    monkeypatch.setattr("app.embedding_worker.check_embedding_backend", check_embedding_backend)
+
+
+def test_poisoned_batch_is_counted_when_backend_is_up(monkeypatch):
+    backend(monkeypatch, up=True)
+    client = FakeClient({"a", "b"})
+    assert embed(client, ["a", "b"]) == 0
+    assert client.failures == ["a", "b"]
+
+
+def test_lone_poisoned_entity_is_counted_when_backend_is_up(monkeypatch):
+    backend(monkeypatch, up=True)
+    client = FakeClient({"a"})
+    assert embed(client, ["a"]) == 0
+    assert client.failures == ["a"]
+
+
+def test_failures_are_not_counted_when_backend_is_down(monkeypatch):
+    backend(monkeypatch, up=False)
+    client = FakeClient({"a", "b"})
+    with pytest.raises(RuntimeError, match="backend unavailable"):
+        embed(client, ["a", "b"])
+    with pytest.raises(RuntimeError, match="backend unavailable"):
+        embed(client, ["a"])
+    assert client.failures == []
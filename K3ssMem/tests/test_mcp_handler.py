@@ -0,0 +1,105 @@
+import asyncio
+
+from app import mcp_handler
+from app.tools import TOOLS, Tool
+
+
+def register(monkeypatch, name, handler, read_only):
+    monkeypatch.setitem(TOOLS, name, Tool(name, name, {}, handler, f"Error in {name}", read_only=read_only))
+
+
+def call(name, request_id=None, **arguments):
+    request = {"jsonrpc": "2.0", "method": "tools/call", "params": {"name": name, "arguments": arguments}}
+    if request_id is not None:
+        request["id"] = request_id
+    return request
+
+
+def test_batch_keeps_write_order_and_answers_in_request_order(monkeypatch):
+    log = []
+
+    async def write(neo4j_client, tool_args):
+        await asyncio.sleep(0.01)
+        log.append(("write", tool_args["value"]))
+        return {"written": tool_args["value"]}
+
+    async def read(neo4j_client, tool_args):
+        log.append(("read", list(log)))
+        return {"seen": len(log) - 1}
+
+    register(monkeypatch, "test_write", write, read_only=False)
+    register(monkeypatch, "test_read", read, read_only=True)
+
+    responses = asyncio.run(mcp_handler.handle_mcp_batch([
+        call("test_write", 1, value="a"),
+        call("test_read", 2),
+        call("test_write", 3, value="b"),
+    ], None))
+
+    assert [response["id"] for response in responses] == [1, 2, 3]
+    assert responses[1]["result"] == {"seen": 1}
+    assert [entry for entry in log if entry[0] == "write"] == [("write", "a"), ("write", "b")]
+
+
+def test_batch_does_not_answer_notifications(monkeypatch):
+    async def read(neo4j_client, tool_args):
+        return {"ok": True}
+
+    register(monkeypatch, "test_read", read, read_only=True)
+
+    responses = asyncio.run(mcp_handler.handle_mcp_batch([
+        call("test_read"),
+        {"jsonrpc": "2.0", "method": "unknown/method"},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        call("test_read", 7),
+        5,
+    ], None))
+
+    assert [response["id"] for response in responses] == [7, None]
+    assert responses[0]["result"] == {"ok": True}
+    assert responses[1]["error"]["code"] == -32600
+
+
+def test_read_in_flight_during_a_write_is_not_cached(monkeypatch):
+    from app.result_cache import result_cache
+
+    calls = []
+    read_started = None
+    write_done = None
+
+    async def read(neo4j_client, tool_args):
+        calls.append("read")
+        read_started.set()
+        await write_done.wait()
+        return {"graph": "before the write"}
+
+    async def write(neo4j_client, tool_args):
+        return {"ok": True}
+
+    monkeypatch.setitem(TOOLS, "test_cached_read", Tool(
+        "test_cached_read", "", {}, read, "Error", read_only=True, cacheable=True
+    ))
+    register(monkeypatch, "test_write", write, read_only=False)
+    monkeypatch.setattr(mcp_handler, "WRITE_TOOLS", mcp_handler.WRITE_TOOLS | {"test_write"})
+    result_cache.invalidate()
+
+    async def main():
+        nonlocal read_started, write_done
+        read_started, write_done = asyncio.Event(), asyncio.Event()
+        pending_read = asyncio.create_task(mcp_handler.handle_mcp_request(call("test_cached_read", 1), None))
+        await read_started.wait()
+        await mcp_handler.handle_mcp_request(call("test_write", 2, value="a"), None)
+        write_done.set()
+        await pending_read
+        # The first read must not have been cached, so this one runs again
+        await mcp_handler.handle_mcp_request(call("test_cached_read", 3), None)
+
+    asyncio.run(main())
+
+    assert calls == ["read", "read"]
+
+
+def test_unpaginated_read_graph_is_not_cached():
+    read_graph = TOOLS["read_graph"]
+    assert not read_graph.caches({})
+    assert read_graph.caches({"limit": 100})
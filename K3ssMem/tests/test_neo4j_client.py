@@ -0,0 +1,15 @@
+from app.neo4j_client import escape_lucene
+
+
+def test_escape_lucene_escapes_special_characters():
+    assert escape_lucene("x-y (z)") == "x\\-y \\(z\\)"
+
+
+def test_escape_lucene_disarms_boolean_operators():
+    assert escape_lucene("cache OR") == "cache or"
+    assert escape_lucene("NOT") == "not"
+    assert escape_lucene("a AND b") == "a and b"
+
+
+def test_escape_lucene_keeps_words_containing_operators():
+    assert escape_lucene("ORACLE NOTE") == "ORACLE NOTE"
@@ -0,0 +1,33 @@
+from app.result_cache import ResultCache
+from app.serialization import dumps
+
+
+def test_put_past_max_bytes_evicts_least_recently_used():
+    value = {"text": "x" * 100}
+    size = len(dumps(value))
+    cache = ResultCache(max_entries=10, ttl=60, max_bytes=2 * size)
+
+    cache.put("a", value, cache.generation)
+    cache.put("b", value, cache.generation)
+    # Reading a makes b the least recently used entry
+    cache.get("a")
+    cache.put("c", value, cache.generation)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == value and cache.get("c") == value
+    assert cache.stats()["bytes"] == 2 * size
+
+
+def test_result_larger_than_max_bytes_is_not_cached():
+    cache = ResultCache(max_entries=10, ttl=60, max_bytes=10)
+    cache.put("a", {"text": "x" * 100}, cache.generation)
+    assert cache.get("a") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_result_computed_before_a_write_is_not_cached():
+    cache = ResultCache(max_entries=10, ttl=60, max_bytes=1024)
+    generation = cache.generation
+    cache.invalidate()
+    cache.put("a", {"stale": True}, generation)
+    assert cache.get("a") is None
@@ -0,0 +1,19 @@
+import asyncio
+
+from app import schema
+
+
+def test_vector_index_is_retried_until_created(monkeypatch):
+    attempts = []
+
+    async def create_vector_index(client):
+        attempts.append(client)
+        if len(attempts) < 3:
+            raise RuntimeError("model not pulled yet")
+
+    monkeypatch.setattr(schema, "_create_vector_index", create_vector_index)
+    monkeypatch.setattr(schema, "VECTOR_INDEX_RETRY_DELAY", 0)
+
+    asyncio.run(schema._retry_vector_index("client"))
+
+    assert attempts == ["client"] * 3
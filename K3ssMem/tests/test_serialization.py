@@ -0,0 +1,62 @@
+import gzip
+
+import pytest
+
+from app import serialization
+from app.config import settings
+
+
+@pytest.fixture
+def both_encodings(monkeypatch):
+    monkeypatch.setattr(serialization, "available_encodings", lambda: ["zstd", "gzip"])
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    (None, None),
+    ("", None),
+    ("gzip", "gzip"),
+    ("zstd, gzip", "zstd"),
+    ("gzip, zstd", "zstd"),
+    ("gzip, zstd;q=0.5", "gzip"),
+    ("gzip;q=0.8, zstd;q=0.9", "zstd"),
+    ("GZIP", "gzip"),
+    ("gzip; q=0", None),
+    ("identity", None),
+    ("br, deflate", None),
+    ("*", "zstd"),
+    ("*;q=0.5, gzip", "gzip"),
+    ("gzip;q=0, *", "zstd"),
+    ("*;q=0", None),
+    ("*;q=0, gzip", "gzip"),
+    ("gzip;q=abc", None),
+])
+def test_choose_encoding(both_encodings, accept_encoding, expected):
+    assert serialization.choose_encoding(accept_encoding) == expected
+
+
+def test_choose_encoding_skips_unavailable_codings(monkeypatch):
+    monkeypatch.setattr(serialization, "available_encodings", lambda: ["gzip"])
+    assert serialization.choose_encoding("zstd") is None
+    assert serialization.choose_encoding("zstd, gzip;q=0.1") == "gzip"
+
+
+@pytest.mark.parametrize("size, accept_encoding, expected", [
+    (99, "gzip", None),
+    (100, "gzip", "gzip"),
+    (1000, None, None),
+    (1000, "identity", None),
+])
+def test_encode_body_threshold(monkeypatch, size, accept_encoding, expected):
+    monkeypatch.setattr(serialization, "available_encodings", lambda: ["gzip"])
+    monkeypatch.setattr(settings, "RESPONSE_COMPRESSION_MIN_BYTES", 100)
+    body = b"x" * size
+
+    encoded, encoding = serialization.encode_body(body, accept_encoding)
+
+    assert encoding == expected
+    assert (gzip.decompress(encoded) if encoding else encoded) == body
+
+
+def test_encode_body_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_COMPRESSION", False)
+    assert serialization.encode_body(b"x" * 100_000, "gzip") == (b"x" * 100_000, None)
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from stdio_server import HttpDispatcher, WriteBarrier, expects_response, is_read_message
+
+
+def call(name):
+    return {"jsonrpc": "2.0", "method": "tools/call", "params": {"name": name}, "id": 1}
+
+
+def test_is_read_message():
+    assert is_read_message({"jsonrpc": "2.0", "method": "initialize", "id": 1})
+    assert is_read_message(call("semantic_search"))
+    assert not is_read_message(call("create_entities"))
+    assert not is_read_message(call("unknown_tool"))
+    assert not is_read_message([call("read_graph"), call("create_relations")])
+
+
+def test_write_barrier_orders_writes_around_reads():
+    log = []
+
+    def step(name, delay):
+        async def run():
+            log.append(f"start {name}")
+            await asyncio.sleep(delay)
+            log.append(f"end {name}")
+        return run
+
+    async def main():
+        barrier = WriteBarrier()
+        tasks = [
+            barrier.start(call("create_entities"), step("create_entities", 0.02)),
+            barrier.start(call("create_relations"), step("create_relations", 0)),
+            barrier.start(call("open_nodes"), step("open_nodes", 0.02)),
+            barrier.start(call("read_graph"), step("read_graph", 0)),
+            barrier.start(call("delete_entities"), step("delete_entities", 0)),
+        ]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+    assert log.index("end create_entities") < log.index("start create_relations")
+    assert log.index("end create_relations") < log.index("start open_nodes")
+    # Consecutive reads overlap
+    assert log.index("start read_graph") < log.index("end open_nodes")
+    assert log.index("end open_nodes") < log.index("start delete_entities")
+
+
+def test_empty_batch_expects_an_error_response():
+    assert expects_response([])
+    assert not expects_response([{"jsonrpc": "2.0", "method": "notifications/initialized"}])
+
+
+def dispatch_over(handler, message):
+    import httpx
+
+    async def run():
+        dispatcher = HttpDispatcher()
+        dispatcher.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await dispatcher.dispatch(message)
+        finally:
+            await dispatcher.close()
+
+    return asyncio.run(run())
+
+
+def test_http_dispatcher_returns_none_only_for_204():
+    import httpx
+
+    assert dispatch_over(lambda request: httpx.Response(204), call("create_entities")) is None
+    with pytest.raises(RuntimeError, match="HTTP 502"):
+        dispatch_over(lambda request: httpx.Response(502), call("create_entities"))